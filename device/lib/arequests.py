@@ -0,0 +1,221 @@
+"""Cooperative requests for the tasks scheduler.
+
+request() and pipeline() are generators to be used with "yield from" inside a
+task. They work like urequests.Session.request() and Session.pipeline(), with
+the same Response objects, connection pooling, deadlines and stats, but where
+urequests blocks waiting on the network they yield POLL_MS to the scheduler,
+so other tasks keep running:
+
+- while the connection (and on the Xbee the TLS handshake) is set up,
+- while waiting for the server to answer each request.
+
+Once a response has started to arrive, its head and body are read like
+urequests does. Sending still blocks, but a request is a buffer or two that
+the modem takes at once.
+
+Waiting for the connection needs select.poll. Without it connecting blocks,
+as does a DNS lookup that misses the urequests resolver cache.
+"""
+
+import time
+
+import urequests
+
+try:
+    import uselect as select
+except ImportError:
+    try:
+        import select
+    except ImportError:
+        select = None
+
+# How long a waiting request sleeps between checks, in milliseconds.
+POLL_MS = 20
+# errno values of a read that would block (EAGAIN, EWOULDBLOCK on some ports).
+_WOULD_BLOCK = (11, 35)
+
+
+class _Stream:
+    # A socket that can check for a response without blocking. The byte read
+    # by ready() is handed back by the next readline(), which is always the
+    # one reading the status line.
+
+    def __init__(self, s):
+        self.s = s
+        self._byte = bytearray(1)
+        self._pending = False
+
+    def ready(self):
+        # True once the response has started to arrive (or the connection
+        # was closed). The socket must be non-blocking.
+        if self._pending:
+            return True
+        try:
+            n = self.s.readinto(self._byte)
+        except OSError as e:
+            if e.args[0] in _WOULD_BLOCK:
+                return False
+            # Let reading the head report it.
+            return True
+        if n is None:
+            return False
+        self._pending = n == 1
+        return True
+
+    def readline(self):
+        if not self._pending:
+            return self.s.readline()
+        self._pending = False
+        if self._byte[0] == 0x0A:
+            return bytes(self._byte)
+        return bytes(self._byte) + self.s.readline()
+
+    def read(self, n=-1):
+        return self.s.read(n)
+
+    def readinto(self, buf, n=None):
+        if n is None:
+            return self.s.readinto(buf)
+        return self.s.readinto(buf, n)
+
+    def write(self, data):
+        return self.s.write(data)
+
+    def settimeout(self, t):
+        self.s.settimeout(t)
+
+    def setblocking(self, flag):
+        self.s.setblocking(flag)
+
+    def close(self):
+        self.s.close()
+
+
+def _connect(session, proto, host, port, deadline):
+    # Connect without blocking where the socket can be polled.
+    s = urequests._connect(proto, host, port, session.verify, session.cert,
+                           deadline, blocking=select is None)
+    if select is None:
+        return s
+    since = time.ticks_ms()
+    poller = select.poll()
+    poller.register(s, select.POLLOUT)
+    try:
+        while True:
+            events = poller.poll(0)
+            if events:
+                break
+            if deadline:
+                deadline.check("connect", since)
+            yield POLL_MS
+        poller.unregister(s)
+        if events[0][1] & (select.POLLERR | select.POLLHUP):
+            raise OSError("connect failed")
+    except OSError as e:
+        if urequests.stats:
+            urequests.stats.end(False)
+        s.close()
+        urequests.resolver.invalidate(host, port)
+        raise urequests._timeout_error(e, "connect")
+    if urequests.stats:
+        urequests.stats.mark(urequests.CONNECT)
+    return s
+
+
+def _wait(s, deadline):
+    # Yield until a response starts to arrive on s, then make s blocking
+    # again (with what is left of the read deadline) to read it.
+    since = time.ticks_ms()
+    try:
+        s.setblocking(False)
+    except OSError:
+        # Closed after the previous response, reading the head reports it.
+        return
+    while not s.ready():
+        if deadline:
+            deadline.check("read", since)
+        yield POLL_MS
+    if deadline:
+        deadline.arm(s, "read")
+    else:
+        s.settimeout(None)
+
+
+def _exchange(session, key, host, deadline, requests):
+    # Cooperative Session._exchange: send the requests and read the first
+    # response's head.
+    proto, _, port = key
+    stats = urequests.stats
+    while True:
+        s = session._pool.pop(key, None)
+        reused = s is not None
+        if stats:
+            stats.begin(reused)
+        if not reused:
+            s = yield from _connect(session, proto, host, port, deadline)
+        if not isinstance(s, _Stream):
+            s = _Stream(s)
+        try:
+            if deadline:
+                deadline.arm(s, "read")
+            else:
+                s.settimeout(None)
+            urequests._send_all(s, host, requests)
+            yield from _wait(s, deadline)
+            return s, urequests._read_head(s, requests[0][0])
+        except OSError as e:
+            if stats:
+                stats.end(False)
+            s.close()
+            e = urequests._timeout_error(e, "read")
+            # Same retry rules as Session._exchange.
+            if (not reused or isinstance(e, urequests.RequestTimeout)
+                    or urequests._one_shot(requests)):
+                raise e
+
+
+def request(session, method, url, data=None, json=None, headers={},
+            timeout=None):
+    """Cooperative Session.request(), returns the Response."""
+    if timeout is None:
+        timeout = session.timeout
+    deadline = urequests._Deadline(timeout) if timeout is not None else None
+    proto, host, port, path = urequests._parse_url(url)
+    key = (proto, host, port)
+    s, head = yield from _exchange(session, key, host, deadline,
+                                   [(method, path, data, json, headers)])
+    return session._response(key, s, head, deadline)
+
+
+def post(session, url, **kw):
+    return (yield from request(session, "POST", url, **kw))
+
+
+def pipeline(session, requests, handle, timeout=None):
+    """Cooperative Session.pipeline().
+
+    Each response is passed to handle(response) in order, and closed after
+    it returns. Returns the list of what handle returned.
+    """
+    if timeout is None:
+        timeout = session.timeout
+    deadline = urequests._Deadline(timeout) if timeout is not None else None
+    key, host, parsed = session._parse_pipeline(requests)
+    s, head = yield from _exchange(session, key, host, deadline, parsed)
+    responses = session._responses(key, s, head, deadline, parsed)
+    results = []
+    try:
+        for i in range(len(parsed)):
+            if i:
+                yield from _wait(s, deadline)
+            response = next(responses)
+            try:
+                results.append(handle(response))
+            finally:
+                response.close()
+        # Let the last response go back to the pool.
+        for _ in responses:
+            pass
+    finally:
+        responses.close()
+    return results
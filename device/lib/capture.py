@@ -0,0 +1,53 @@
+"""Move clicks from the Qwiic button's queue into the event buffer.
+
+ClickCapture.sample() is one pass of main.py's button task: poll the clicked
+queue (see poller), and if it holds clicks, snapshot the oldest one's age
+with the RTC, drain the queue and turn the ages into timestamps (see
+clicktime). It only needs an I2CDriver, so the same code runs against
+simi2c on a host.
+"""
+
+import clicktime
+
+
+class ClickCapture(object):
+    def __init__(
+        self, i2c_driver, qbutton, qrtc, button_poller, record, epoch_offset=0
+    ):
+        """
+        :param record: called with each click's timestamp, oldest first
+        :param epoch_offset: added to each timestamp, e.g. to turn the
+            Xbee's 2000-based epoch into Unix time
+        """
+        self.i2c_driver = i2c_driver
+        self.qbutton = qbutton
+        self.qrtc = qrtc
+        self.poller = button_poller
+        self.record = record
+        self.epoch_offset = epoch_offset
+
+    def sample(self):
+        """Poll the button once and record any queued clicks.
+
+        Returns the number of clicks recorded. Bus errors are raised as
+        OSError after recording the clicks already popped; the rest stay on
+        the button for the next pass.
+        """
+        # The poller checks for an empty queue first, so idle polls stay
+        # one read.
+        if not self.poller.poll():
+            return 0
+        ages = []
+        try:
+            # Hold the bus so the drain follows the snapshot directly.
+            with self.i2c_driver:
+                snap = clicktime.snapshot(self.qbutton, self.qrtc)
+                self.qbutton.drain_clicked_queue(values=ages)
+            self.poller.drained(ages)
+        finally:
+            # Clicks popped before a bus error are off the button already,
+            # record them before the error goes up.
+            if ages:
+                for timestamp in clicktime.reconstruct(snap, ages):
+                    self.record(timestamp + self.epoch_offset)
+        return len(ages)
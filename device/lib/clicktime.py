@@ -0,0 +1,60 @@
+"""Reconstruct absolute click times from the Qwiic button's clicked queue.
+
+The button does not store wall-clock times. Each queue entry is read back as
+the age of the click in milliseconds: the button's 32-bit millis() counter
+minus the counter value when the click happened. Ages keep growing while they
+sit in the queue, so a click's absolute time is "now minus its age", not
+"now plus its age".
+
+To turn ages into timestamps we take a snapshot: the age of the oldest queued
+click read back to back with the RTC. Ages popped during the drain that
+follows are a few milliseconds older than they were at snapshot time; that
+drift is measured on the oldest click and removed from every entry.
+
+Because the button's counter is 32 bits, ages are only meaningful for clicks
+younger than ~49 days.
+"""
+
+MILLIS_MASK = 0xFFFFFFFF
+# Drift larger than this means the queue changed under us; ignore it.
+MAX_DRIFT_MS = 60 * 1000
+
+
+def snapshot(qbutton, qrtc):
+    """Read the oldest click's age together with the RTC.
+
+    Only call this when the clicked queue is not empty.
+    Returns (epoch seconds, milliseconds into that second, oldest age).
+    """
+    oldest_age = qbutton.time_since_first_click()
+    seconds, hundredths = qrtc.get_precise_epoch_time()
+    return int(seconds), hundredths * 10, oldest_age
+
+
+def reconstruct(snap, ages):
+    """Return absolute click times in epoch seconds, oldest first.
+
+    :param snap: the tuple returned by snapshot(), taken before the drain
+    :param ages: clicked queue values popped after the snapshot, oldest first
+    """
+    seconds, millis, oldest_age = snap
+    if not ages:
+        return []
+    # Time that passed on the button between the snapshot and the first pop.
+    drift = (ages[0] - oldest_age) & MILLIS_MASK
+    if drift > MAX_DRIFT_MS:
+        drift = 0
+    times = []
+    previous_age = MILLIS_MASK
+    for age in ages:
+        # Ages are unsigned: the button computes them with wrapping 32-bit
+        # math, so they stay valid across a millis() rollover (for clicks
+        # younger than ~49 days). Clicks that landed after the snapshot are
+        # younger than the drift; stamp them at snapshot time.
+        age = age - drift if age >= drift else 0
+        # Keep times ordered even if the button's reads were noisy.
+        if age > previous_age:
+            age = previous_age
+        previous_age = age
+        times.append(seconds + (millis - age) // 1000)
+    return times
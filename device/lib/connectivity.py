@@ -0,0 +1,74 @@
+"""Cached view of network connectivity.
+
+The state is fed by the outcomes of real requests, so deciding whether to
+attempt an upload costs nothing. Only when nothing has updated the state for
+stale_ms do we probe, and the probe is local: the Xbee's association
+indication (AT command AI), which asks the modem rather than the network.
+"""
+
+import time
+
+try:
+    import xbee
+except ImportError:
+    xbee = None
+
+UNKNOWN = "unknown"
+UP = "up"
+DEGRADED = "degraded"
+DOWN = "down"
+
+
+class ConnectivityMonitor(object):
+    def __init__(self, stale_ms=60 * 1000, down_after=3):
+        self.stale_ms = stale_ms
+        # Consecutive request failures before we consider the link down.
+        self.down_after = down_after
+        self.state = UNKNOWN
+        self.failures = 0
+        self._updated = None
+
+    def record_success(self):
+        """A request reached the server."""
+        self.state = UP
+        self.failures = 0
+        self._updated = time.ticks_ms()
+
+    def record_failure(self):
+        """A request failed at the network level."""
+        self.failures += 1
+        self.state = DOWN if self.failures >= self.down_after else DEGRADED
+        self._updated = time.ticks_ms()
+
+    def is_stale(self):
+        return (
+            self._updated is None
+            or time.ticks_diff(time.ticks_ms(), self._updated) > self.stale_ms
+        )
+
+    def check(self):
+        """Return the current state, probing the modem if the cache is stale."""
+        if self.is_stale():
+            self.probe()
+        return self.state
+
+    def probe(self):
+        """Refresh the state from the modem's association indication."""
+        if xbee is None:
+            # No modem to ask, let the next request decide.
+            self._updated = time.ticks_ms()
+            return self.state
+        try:
+            associated = xbee.atcmd("AI") == 0
+        except OSError:
+            associated = False
+        if not associated:
+            self.state = DOWN
+        elif self.state == UNKNOWN:
+            # Attached to the network, the next request will confirm it.
+            self.state = UP
+        elif self.state == DOWN:
+            # Attached, but requests were failing: worth another try.
+            self.state = DEGRADED
+        self._updated = time.ticks_ms()
+        return self.state
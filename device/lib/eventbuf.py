@@ -0,0 +1,68 @@
+"""Fixed-capacity ring buffer of event timestamps.
+
+Timestamps are stored in a preallocated array('I') so the buffer never grows
+or fragments the heap, no matter how long the device stays offline.
+"""
+
+from array import array
+
+# Overflow policies.
+DROP_OLDEST = 0
+DROP_NEWEST = 1
+
+
+class EventBuffer(object):
+    def __init__(self, capacity, policy=DROP_OLDEST):
+        if capacity < 1:
+            raise ValueError("capacity must be positive")
+        self.capacity = capacity
+        self.policy = policy
+        # Count of events lost to overflow.
+        self.dropped = 0
+        self._buf = array("I", bytes(4 * capacity))
+        self._head = 0  # index of the oldest event
+        self._count = 0
+
+    def __len__(self):
+        return self._count
+
+    def push(self, timestamp):
+        """Append a timestamp, applying the overflow policy when full.
+
+        Returns False if the new timestamp was dropped.
+        """
+        if self._count == self.capacity:
+            self.dropped += 1
+            if self.policy == DROP_NEWEST:
+                return False
+            # Overwrite the oldest slot and move the head past it.
+            self._buf[self._head] = timestamp
+            self._head = (self._head + 1) % self.capacity
+            return True
+        self._buf[(self._head + self._count) % self.capacity] = timestamp
+        self._count += 1
+        return True
+
+    def peek(self, index=0):
+        """Return the timestamp at index, counting from the oldest."""
+        if not 0 <= index < self._count:
+            raise IndexError("event index out of range")
+        return self._buf[(self._head + index) % self.capacity]
+
+    __getitem__ = peek
+
+    def pop(self):
+        """Remove and return the oldest timestamp."""
+        timestamp = self.peek()
+        self.discard(1)
+        return timestamp
+
+    def discard(self, count):
+        """Remove up to count of the oldest timestamps."""
+        count = min(count, self._count)
+        self._head = (self._head + count) % self.capacity
+        self._count -= count
+
+    def clear(self):
+        self._head = 0
+        self._count = 0
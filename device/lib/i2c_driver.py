@@ -59,6 +59,99 @@ New to qwiic? Take a look at the entire [SparkFun qwiic ecosystem](https://www.s
 
 """
 
+import time
+
+try:
+    import _thread
+except ImportError:
+    _thread = None
+
+try:
+    from time import ticks_diff, ticks_us
+except ImportError:
+    # CPython
+
+    def ticks_us():
+        return int(time.monotonic() * 1000000)
+
+    def ticks_diff(end, start):
+        return end - start
+
+
+# -----------------------------------------------------------------------------
+# BusLock
+#
+# Reentrant lock guarding an I2C bus, with lock-wait accounting.
+#
+class BusLock(object):
+    """
+    BusLock
+
+            Serializes access to an I2C bus between threads. The thread holding
+            the lock may take it again, so a locked multi-step operation can
+            call methods that lock on their own.
+
+            Cooperative tasks (see tasks.py) all run in one thread, so for them
+            an operation is atomic as long as it doesn't yield while holding
+            the lock.
+
+            Without _thread the lock only counts acquisitions.
+    """
+
+    def __init__(self):
+        self._lock = _thread.allocate_lock() if _thread else None
+        self._owner = None
+        self._depth = 0
+        # Outermost acquisitions, how many had to wait, and for how long.
+        self.acquisitions = 0
+        self.contended = 0
+        self.wait_us = 0
+        self.max_wait_us = 0
+
+    def acquire(self, blocking=True):
+        """
+        Take the lock, waiting for another thread to release it if blocking.
+
+        :return: True if the lock was taken, otherwise False.
+        :rtype: bool
+        """
+        if self._lock is None:
+            self._depth += 1
+            if self._depth == 1:
+                self.acquisitions += 1
+            return True
+        me = _thread.get_ident()
+        if self._owner == me:
+            self._depth += 1
+            return True
+        if not self._lock.acquire(0):
+            if not blocking:
+                return False
+            start = ticks_us()
+            self._lock.acquire()
+            waited = ticks_diff(ticks_us(), start)
+            self.contended += 1
+            self.wait_us += waited
+            if waited > self.max_wait_us:
+                self.max_wait_us = waited
+        self._owner = me
+        self._depth = 1
+        self.acquisitions += 1
+        return True
+
+    def release(self):
+        self._depth -= 1
+        if self._depth == 0 and self._lock is not None:
+            self._owner = None
+            self._lock.release()
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, type, value, traceback):
+        self.release()
+
 
 # -----------------------------------------------------------------------------
 # Platform
@@ -80,7 +173,7 @@ class I2CDriver(object):
     name = "qwiic I2C abstract base class"
 
     def __init__(self, *args, **argk):
-        pass
+        self.lock = BusLock()
 
     # A class method is used to determine if the system is executing on the desired platform
 
@@ -107,15 +200,16 @@ class I2CDriver(object):
         pass
 
     # -------------------------------------------------------------------------
-    # stubs to support Python with statements.
+    # Python with statements hold the bus lock.
     #
-    # Helpful for I2C interactions that require a mutex.
+    # Wrap multi-step I2C interactions in "with driver:" to make them atomic.
 
     def __enter__(self):
+        self.lock.acquire()
         return self
 
     def __exit__(self, type, value, traceback):
-        pass
+        self.lock.release()
 
     # -------------------------------------------------------------------------
     # read Data Command
@@ -200,6 +294,39 @@ class I2CDriver(object):
         """
         return None
 
+    def readBlockInto(self, address, commandCode, buf):
+        """
+        Called to read len(buf) bytes from a specific device into buf.
+        Drivers that can read without allocating override this, the default
+        copies the result of readBlock().
+
+        :param address: The I2C address of the device to read from
+        :param commandCode: The "command" or register to read from
+        :param buf: A bytearray (or memoryview) to read into
+
+        :return: buf
+        :rtype: bytearray
+
+        """
+        data = self.readBlock(address, commandCode, len(buf))
+        for i in range(len(buf)):
+            buf[i] = data[i]
+        return buf
+
+    def read_block_into(self, address, commandCode, buf):
+        """
+        Called to read len(buf) bytes from a specific device into buf.
+
+        :param address: The I2C address of the device to read from
+        :param commandCode: The "command" or register to read from
+        :param buf: A bytearray (or memoryview) to read into
+
+        :return: buf
+        :rtype: bytearray
+
+        """
+        return self.readBlockInto(address, commandCode, buf)
+
     # --------------------------------------------------------------------------
     # write Data Commands
     #
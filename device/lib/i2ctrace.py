@@ -0,0 +1,322 @@
+"""Opt-in tracing of I2C transactions.
+
+TracingI2C wraps an I2CDriver and times every transaction that goes through
+it. For each (address, register) it keeps a count, bytes moved, errors, total
+and worst latency and a latency histogram. The most recent transactions are
+kept in a ring, e.g. to spot redundant reads in the polling loop. Everything
+lives in preallocated arrays: once max_keys registers have been seen, further
+ones are only counted in overflow.
+
+Wrap the driver before handing it to the Qwiic device classes:
+
+    i2c_driver = i2ctrace.TracingI2C(micropython_i2c.MicroPythonI2C())
+    ...
+    i2c_driver.dump()
+"""
+
+from array import array
+import time
+
+from i2c_driver import I2CDriver
+
+try:
+    _ticks_us = time.ticks_us
+except AttributeError:
+
+    def _ticks_us():
+        return time.ticks_ms() * 1000
+
+
+# Transaction kinds.
+READ = 0
+WRITE = 1
+PROBE = 2
+KINDS = ("read", "write", "probe")
+
+# Register value used for transactions that don't address a register.
+NO_REGISTER = 0x100
+# Histogram buckets double in width: under 128 us, under 256 us, ... and the
+# last one holds everything slower.
+HIST_BUCKETS = 8
+HIST_MIN_US = 128
+
+# Fields of a per-register stats array, followed by the histogram.
+_COUNT = 0
+_BYTES = 1
+_ERRORS = 2
+_TOTAL_US = 3
+_MAX_US = 4
+_FIELDS = 5
+
+# Fields of a ring entry: kind, address, register, bytes, start, duration.
+_ENTRY = 6
+
+
+def _bucket(us):
+    bucket = 0
+    limit = HIST_MIN_US
+    while us >= limit and bucket < HIST_BUCKETS - 1:
+        limit <<= 1
+        bucket += 1
+    return bucket
+
+
+class TracingI2C(I2CDriver):
+    name = "tracing I2C driver"
+
+    def __init__(self, driver, ring_size=64, max_keys=32):
+        I2CDriver.__init__(self)
+        self.driver = driver
+        # Share the wrapped driver's bus lock.
+        self.lock = driver.lock
+        self.max_keys = max_keys
+        self._ring = array("I", bytes(4 * _ENTRY * ring_size))
+        self._ring_size = ring_size
+        # One stats array per (address, register) key, all allocated up
+        # front and handed out as new keys are seen.
+        self._free = [
+            array("I", bytes(4 * (_FIELDS + HIST_BUCKETS))) for _ in range(max_keys)
+        ]
+        self.reset()
+
+    def reset(self):
+        """Forget everything recorded so far."""
+        if hasattr(self, "_stats"):
+            for stats in self._stats.values():
+                for i in range(len(stats)):
+                    stats[i] = 0
+                self._free.append(stats)
+        self._stats = {}
+        self._next = 0
+        self._recorded = 0
+        self.overflow = 0
+
+    def _record(self, kind, address, register, nbytes, start, failed):
+        duration = time.ticks_diff(_ticks_us(), start)
+        if register is None:
+            register = NO_REGISTER
+        i = self._next * _ENTRY
+        ring = self._ring
+        ring[i] = kind
+        ring[i + 1] = address
+        ring[i + 2] = register
+        ring[i + 3] = nbytes
+        ring[i + 4] = start & 0xFFFFFFFF
+        ring[i + 5] = duration
+        self._next = (self._next + 1) % self._ring_size
+        self._recorded += 1
+
+        key = (address << 9) | register
+        stats = self._stats.get(key)
+        if stats is None:
+            if not self._free:
+                self.overflow += 1
+                return
+            stats = self._stats[key] = self._free.pop()
+        stats[_COUNT] += 1
+        if failed:
+            stats[_ERRORS] += 1
+        else:
+            stats[_BYTES] += nbytes
+        stats[_TOTAL_US] += duration
+        if duration > stats[_MAX_US]:
+            stats[_MAX_US] = duration
+        stats[_FIELDS + _bucket(duration)] += 1
+
+    def _call(self, kind, address, register, nbytes, method, *args):
+        start = _ticks_us()
+        try:
+            result = method(*args)
+        except Exception:
+            self._record(kind, address, register, nbytes, start, True)
+            raise
+        self._record(kind, address, register, nbytes, start, False)
+        return result
+
+    # read commands ----------------------------------------------------------
+    def readWord(self, address, commandCode):
+        return self._call(
+            READ, address, commandCode, 2, self.driver.readWord, address, commandCode
+        )
+
+    def read_word(self, address, commandCode):
+        return self.readWord(address, commandCode)
+
+    def readByte(self, address, commandCode):
+        return self._call(
+            READ, address, commandCode, 1, self.driver.readByte, address, commandCode
+        )
+
+    def read_byte(self, address, commandCode=None):
+        return self.readByte(address, commandCode)
+
+    def readBlock(self, address, commandCode, nBytes):
+        return self._call(
+            READ,
+            address,
+            commandCode,
+            nBytes,
+            self.driver.readBlock,
+            address,
+            commandCode,
+            nBytes,
+        )
+
+    def read_block(self, address, commandCode, nBytes):
+        return self.readBlock(address, commandCode, nBytes)
+
+    def readBlockInto(self, address, commandCode, buf):
+        return self._call(
+            READ,
+            address,
+            commandCode,
+            len(buf),
+            self.driver.readBlockInto,
+            address,
+            commandCode,
+            buf,
+        )
+
+    def read_block_into(self, address, commandCode, buf):
+        return self.readBlockInto(address, commandCode, buf)
+
+    # write commands----------------------------------------------------------
+    def writeCommand(self, address, commandCode):
+        return self._call(
+            WRITE,
+            address,
+            commandCode,
+            0,
+            self.driver.writeCommand,
+            address,
+            commandCode,
+        )
+
+    def write_command(self, address, commandCode):
+        return self.writeCommand(address, commandCode)
+
+    def writeWord(self, address, commandCode, value):
+        return self._call(
+            WRITE,
+            address,
+            commandCode,
+            2,
+            self.driver.writeWord,
+            address,
+            commandCode,
+            value,
+        )
+
+    def write_word(self, address, commandCode, value):
+        return self.writeWord(address, commandCode, value)
+
+    def writeByte(self, address, commandCode, value):
+        return self._call(
+            WRITE,
+            address,
+            commandCode,
+            1,
+            self.driver.writeByte,
+            address,
+            commandCode,
+            value,
+        )
+
+    def write_byte(self, address, commandCode, value):
+        return self.writeByte(address, commandCode, value)
+
+    def writeBlock(self, address, commandCode, value):
+        return self._call(
+            WRITE,
+            address,
+            commandCode,
+            len(value),
+            self.driver.writeBlock,
+            address,
+            commandCode,
+            value,
+        )
+
+    def write_block(self, address, commandCode, value):
+        return self.writeBlock(address, commandCode, value)
+
+    def isDeviceConnected(self, devAddress):
+        return self._call(
+            PROBE, devAddress, NO_REGISTER, 0, self.driver.isDeviceConnected, devAddress
+        )
+
+    def is_device_connected(self, devAddress):
+        return self.isDeviceConnected(devAddress)
+
+    def ping(self, devAddress):
+        return self.isDeviceConnected(devAddress)
+
+    def scan(self):
+        return self.driver.scan()
+
+    # results ----------------------------------------------------------------
+    def recent(self):
+        """Return the transactions in the ring, oldest first.
+
+        Each is a tuple (kind, address, register, bytes, start_us,
+        duration_us), with register NO_REGISTER for probes.
+        """
+        count = min(self._recorded, self._ring_size)
+        first = (self._next - count) % self._ring_size
+        entries = []
+        for n in range(count):
+            i = ((first + n) % self._ring_size) * _ENTRY
+            entries.append(tuple(self._ring[i : i + _ENTRY]))
+        return entries
+
+    def export(self):
+        """Return the per-register totals as a list of dicts, e.g. for JSON."""
+        totals = []
+        for key in sorted(self._stats):
+            stats = self._stats[key]
+            totals.append(
+                {
+                    "address": key >> 9,
+                    "register": key & 0x1FF,
+                    "count": stats[_COUNT],
+                    "bytes": stats[_BYTES],
+                    "errors": stats[_ERRORS],
+                    "total_us": stats[_TOTAL_US],
+                    "max_us": stats[_MAX_US],
+                    "histogram": list(stats[_FIELDS:]),
+                }
+            )
+        return totals
+
+    def dump(self, recent=False):
+        """Print the per-register totals, and the ring if recent is True."""
+        print("i2c trace: %s transactions" % self._recorded)
+        for totals in self.export():
+            register = totals["register"]
+            print(
+                "i2c trace: 0x%02x %s: %s calls, %s bytes, %s errors, "
+                "avg %s us, max %s us, histogram %s"
+                % (
+                    totals["address"],
+                    "-" if register == NO_REGISTER else "0x%02x" % register,
+                    totals["count"],
+                    totals["bytes"],
+                    totals["errors"],
+                    totals["total_us"] // totals["count"],
+                    totals["max_us"],
+                    totals["histogram"],
+                )
+            )
+        if self.overflow:
+            print("i2c trace: %s transactions not counted per register" % self.overflow)
+        lock = self.lock
+        print(
+            "i2c trace: bus lock: %s acquisitions, %s waited, %s us total, %s us max"
+            % (lock.acquisitions, lock.contended, lock.wait_us, lock.max_wait_us)
+        )
+        if recent:
+            for kind, address, register, nbytes, start, duration in self.recent():
+                print(
+                    "i2c trace: %s %s 0x%02x 0x%02x %s bytes %s us"
+                    % (start, KINDS[kind], address, register, nbytes, duration)
+                )
@@ -0,0 +1,179 @@
+"""Append-only event journal on the flash filesystem.
+
+Pending events are kept on flash so they survive a reboot or power loss.
+
+Two append-only files are used:
+- the log: a 4-byte header holding the sequence number of its first record,
+  followed by fixed-size 4-byte records (little-endian timestamps).
+- the ack file: 4-byte records, each the sequence number up to which events
+  have been uploaded. The last complete record wins.
+
+Sequence numbers are absolute, so compaction can swap in a shorter log without
+touching the ack file first. A torn write only ever loses a trailing partial
+record, which is cut off on open. A new log's header goes through the same
+write-and-rename as compaction, so the log always has one.
+"""
+
+import uos
+
+RECORD_SIZE = 4
+
+
+def _exists(path):
+    try:
+        uos.stat(path)
+        return True
+    except OSError:
+        return False
+
+
+def _file_size(path):
+    try:
+        return uos.stat(path)[6]
+    except OSError:
+        return 0
+
+
+def _decode(buf, offset=0):
+    return (
+        buf[offset]
+        | (buf[offset + 1] << 8)
+        | (buf[offset + 2] << 16)
+        | (buf[offset + 3] << 24)
+    )
+
+
+def _read_last_record(path):
+    """Return the last complete record in a file of 4-byte records, or None."""
+    size = _file_size(path) // RECORD_SIZE * RECORD_SIZE
+    if not size:
+        return None
+    with open(path, "rb") as f:
+        f.seek(size - RECORD_SIZE)
+        return _decode(f.read(RECORD_SIZE))
+
+
+class Journal(object):
+    def __init__(self, path="/flash/events", write_buffer=16, compact_after=64):
+        self._log_path = path + ".log"
+        self._ack_path = path + ".ack"
+        self._new_path = path + ".new"
+        # Appended records are held here and written to flash in one go.
+        self._pending = bytearray(write_buffer * RECORD_SIZE)
+        self._pending_len = 0
+        self._compact_after = compact_after
+        self._ack_writes = 0
+        self._recover()
+
+    def _recover(self):
+        """Finish or roll back an interrupted compaction and load offsets."""
+        if _exists(self._new_path):
+            if _exists(self._log_path):
+                # Crashed before the swap: the old log is still complete.
+                uos.remove(self._new_path)
+            else:
+                uos.rename(self._new_path, self._log_path)
+        acked = _read_last_record(self._ack_path)
+        if _file_size(self._log_path) < RECORD_SIZE:
+            # Missing, or torn before its header was complete. Start past
+            # anything the ack file still holds so stale acks can't cover
+            # new events.
+            self._rewrite_log(acked or 0, 0, 0)
+        with open(self._log_path, "rb") as f:
+            self._base = _decode(f.read(RECORD_SIZE))
+        records = (_file_size(self._log_path) - RECORD_SIZE) // RECORD_SIZE
+        # Drop a torn trailing record so new appends stay aligned.
+        expected = RECORD_SIZE + records * RECORD_SIZE
+        if _file_size(self._log_path) != expected:
+            self._rewrite_log(self._base, 0, records)
+        self._end = self._base + records
+        if acked is None or acked < self._base:
+            acked = self._base
+        self._acked = min(acked, self._end)
+        self._ack_writes = _file_size(self._ack_path) // RECORD_SIZE
+        if _file_size(self._ack_path) % RECORD_SIZE:
+            # A torn ack would misalign every later one. Compaction moves
+            # the last complete ack into the log header and empties the file.
+            self.compact()
+
+    def __len__(self):
+        """Number of events appended but not yet acknowledged."""
+        return self._end + self._pending_len // RECORD_SIZE - self._acked
+
+    def append(self, timestamp):
+        """Queue a timestamp for the next flush."""
+        if self._pending_len == len(self._pending):
+            self.flush()
+        self._pending[self._pending_len : self._pending_len + RECORD_SIZE] = (
+            timestamp.to_bytes(RECORD_SIZE, "little")
+        )
+        self._pending_len += RECORD_SIZE
+
+    def flush(self):
+        """Write queued records to flash in a single append."""
+        if not self._pending_len:
+            return
+        with open(self._log_path, "ab") as f:
+            f.write(memoryview(self._pending)[: self._pending_len])
+        self._end += self._pending_len // RECORD_SIZE
+        self._pending_len = 0
+
+    def ack(self, count):
+        """Mark the oldest count pending events as uploaded."""
+        if count <= 0:
+            return
+        self.flush()
+        self._acked = min(self._acked + count, self._end)
+        with open(self._ack_path, "ab") as f:
+            f.write(self._acked.to_bytes(RECORD_SIZE, "little"))
+        self._ack_writes += 1
+
+    def replay(self, limit=None):
+        """Yield unacknowledged timestamps, oldest first.
+
+        If limit is given and more events are pending, the oldest excess
+        events are acknowledged (dropped) first so the caller never receives
+        more than it can hold.
+        """
+        self.flush()
+        if limit is not None and self._end - self._acked > limit:
+            self.ack(self._end - self._acked - limit)
+        buf = bytearray(RECORD_SIZE)
+        with open(self._log_path, "rb") as f:
+            f.seek(RECORD_SIZE * (1 + self._acked - self._base))
+            for _ in range(self._end - self._acked):
+                f.readinto(buf)
+                yield _decode(buf)
+
+    def needs_compaction(self):
+        return (
+            self._acked - self._base >= self._compact_after
+            or self._ack_writes >= self._compact_after
+        )
+
+    def compact(self):
+        """Drop acknowledged records from the log and reset the ack file."""
+        self.flush()
+        self._rewrite_log(
+            self._acked, self._acked - self._base, self._end - self._acked
+        )
+        self._base = self._acked
+        # The log header now carries the ack offset, so the ack file can go.
+        with open(self._ack_path, "wb"):
+            pass
+        self._ack_writes = 0
+
+    def _rewrite_log(self, base, skip, records):
+        """Write a new log starting at base with records copied after skip."""
+        buf = bytearray(RECORD_SIZE)
+        with open(self._new_path, "wb") as dst:
+            dst.write(base.to_bytes(RECORD_SIZE, "little"))
+            if records:
+                with open(self._log_path, "rb") as src:
+                    src.seek(RECORD_SIZE * (1 + skip))
+                    for _ in range(records):
+                        src.readinto(buf)
+                        dst.write(buf)
+        if _exists(self._log_path):
+            uos.remove(self._log_path)
+        uos.rename(self._new_path, self._log_path)
@@ -81,6 +81,11 @@ class MicroPythonI2C(I2CDriver):
 
         self._i2cbus = _connectToI2CBus(sda=self._sda, scl=self._scl, freq=self._freq)
 
+        # Scratch buffers for byte and word reads, so reads in a polling
+        # loop don't allocate.
+        self._byte_buf = bytearray(1)
+        self._word_buf = bytearray(2)
+
     @classmethod
     def isPlatform(cls):
         try:
@@ -117,15 +122,20 @@ class MicroPythonI2C(I2CDriver):
             super(I2CDriver, self).__setattr__(name, value)
 
     # read commands ----------------------------------------------------------
+    # The scratch buffers are shared, hold the lock until they've been read.
     def readWord(self, address, commandCode):
-        buffer = self._i2cbus.readfrom_mem(address, commandCode, 2)
-        return (buffer[1] << 8) | buffer[0]
+        with self:
+            buffer = self._word_buf
+            self._i2cbus.readfrom_mem_into(address, commandCode, buffer)
+            return (buffer[1] << 8) | buffer[0]
 
     def read_word(self, address, commandCode):
         return self.readWord(address, commandCode)
 
     def readByte(self, address, commandCode):
-        return self._i2cbus.readfrom_mem(address, commandCode, 1)[0]
+        with self:
+            self._i2cbus.readfrom_mem_into(address, commandCode, self._byte_buf)
+            return self._byte_buf[0]
 
     def read_byte(self, address, commandCode=None):
         return self.readByte(address, commandCode)
@@ -136,6 +146,13 @@ class MicroPythonI2C(I2CDriver):
     def read_block(self, address, commandCode, nBytes):
         return self.readBlock(address, commandCode, nBytes)
 
+    def readBlockInto(self, address, commandCode, buf):
+        self._i2cbus.readfrom_mem_into(address, commandCode, buf)
+        return buf
+
+    def read_block_into(self, address, commandCode, buf):
+        return self.readBlockInto(address, commandCode, buf)
+
     # write commands----------------------------------------------------------
     def writeCommand(self, address, commandCode):
         self._i2cbus.writeto(address, commandCode.to_bytes(1, "little"))
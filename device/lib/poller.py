@@ -0,0 +1,91 @@
+"""Adaptive polling of the Qwiic button's clicked queue.
+
+The button buffers up to 15 clicks itself, so when nothing is happening we can
+poll it slowly. Any click in the queue switches straight back to fast polling
+(burst mode), which is held for burst_ms before the interval starts backing
+off again. slow_ms bounds how long clicks can pile up between polls, so keep
+it well under the time it takes to click 15 times.
+
+The button only says its queue is full once clicks are already being lost.
+The earlier signal is the click rate seen in each drain (see drained()): if
+clicks came fast enough to fill the queue within the current backoff limit,
+the limit is lowered so a repeat burst after an idle spell gets drained in
+time. A lowered limit goes back to slow_ms once forget_ms passes without
+another drain that fast.
+"""
+
+import time
+
+# Entries in the Qwiic button's clicked queue.
+QUEUE_SIZE = 15
+
+
+class AdaptivePoller(object):
+    def __init__(
+        self,
+        qbutton,
+        fast_ms=100,
+        slow_ms=2000,
+        backoff=2,
+        burst_ms=10000,
+        forget_ms=10 * 60 * 1000,
+    ):
+        self.qbutton = qbutton
+        self.fast_ms = fast_ms
+        self.slow_ms = slow_ms
+        self.backoff = backoff
+        self.burst_ms = burst_ms
+        self.forget_ms = forget_ms
+        # Milliseconds to wait before the next poll.
+        self.interval_ms = fast_ms
+        # Longest interval to back off to, lowered by fast drains.
+        self.ceiling_ms = slow_ms
+        # Polls that found the clicked queue full, i.e. clicks were lost.
+        self.full_polls = 0
+        self._last_activity = time.ticks_ms()
+        self._lowered_at = self._last_activity
+
+    def poll(self):
+        """Read the queue status once and adapt the polling interval.
+
+        Returns True if the clicked queue has entries to drain.
+        """
+        self.qbutton.read_clicked_queue_status()
+        if self.qbutton.clicked_is_full:
+            self.full_polls += 1
+            print("poller: clicked queue full, clicks may have been lost")
+        if not self.qbutton.clicked_is_empty:
+            self._burst()
+            return True
+        now = time.ticks_ms()
+        if (
+            self.ceiling_ms < self.slow_ms
+            and time.ticks_diff(now, self._lowered_at) > self.forget_ms
+        ):
+            self.ceiling_ms = self.slow_ms
+        if time.ticks_diff(now, self._last_activity) > self.burst_ms:
+            self.interval_ms = min(self.interval_ms * self.backoff, self.ceiling_ms)
+        return False
+
+    def drained(self, ages):
+        """Adapt the backoff limit to the click rate of a drain.
+
+        :param ages: the clicked queue values popped, oldest first
+        """
+        if len(ages) < 2:
+            # No rate to go on. The limit goes back up once a drain shows
+            # clicks coming slower, or after forget_ms (see poll()).
+            return
+        # Time from the oldest to the newest click, and how long the queue
+        # would take to fill at that rate. Poll at least twice in that time.
+        span_ms = max(0, ages[0] - ages[-1])
+        fill_ms = span_ms * (QUEUE_SIZE - 1) // (len(ages) - 1)
+        self.ceiling_ms = max(self.fast_ms, min(fill_ms // 2, self.slow_ms))
+        if self.ceiling_ms < self.slow_ms:
+            self._lowered_at = time.ticks_ms()
+        if self.interval_ms > self.ceiling_ms:
+            self.interval_ms = self.ceiling_ms
+
+    def _burst(self):
+        self._last_activity = time.ticks_ms()
+        self.interval_ms = self.fast_ms
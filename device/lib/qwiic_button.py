@@ -116,6 +116,22 @@ class QwiicButton(object):
     LED_PULSE_OFF_TIME = 0x1D
     I2C_ADDRESS = 0x1F
 
+    # Register shadow
+    # Stable registers only change when we write them, so their last known
+    # value is kept and reads and unchanged writes of them skip the bus.
+    # The queue status registers change under us, but the firmware only
+    # accepts writes to their pop request bit: the last value read is a valid
+    # base for a pop request, so pops don't read the status again. Set
+    # shadow_registers to False to always go to the bus, e.g. for debugging.
+    STABLE_REGISTERS = (
+        INTERRUPT_CONFIG,
+        BUTTON_DEBOUNCE_TIME,
+        LED_BRIGHTNESS,
+        LED_PULSE_GRANULARITY,
+        LED_PULSE_CYCLE_TIME,
+        LED_PULSE_OFF_TIME,
+    )
+
     # Status Flags
     event_available = 0
     has_been_clicked = 0
@@ -137,6 +153,12 @@ class QwiicButton(object):
 
     # Constructor
     def __init__(self, address=None, i2c_driver=None):
+        # Reused by the queue time reads, so polling doesn't allocate.
+        self._time_buf = bytearray(4)
+        # register -> last value read or written, see STABLE_REGISTERS.
+        self.shadow_registers = True
+        self._shadow = {}
+
         # Did the user specify an I2C address?
         if address in self.available_addresses:
             self.address = address
@@ -179,13 +201,63 @@ class QwiicButton(object):
         :return: Returns true if the intialization was successful, otherwise False.
         :rtype: bool
         """
-        if self.is_connected() == True:
-            id = self._i2c.readByte(self.address, self.ID)
+        with self._i2c:
+            # The device may have been reset, forget what we knew about it.
+            self.invalidate_shadow()
+            if self.is_connected() == True:
+                id = self._i2c.readByte(self.address, self.ID)
+
+                if id == self.DEV_ID:
+                    return True
 
-            if id == self.DEV_ID:
-                return True
+            return False
+
+    # ------------------------------------------------
+    # invalidate_shadow()
+    #
+    # Forget the shadowed register values, e.g. after the device was reset.
+    def invalidate_shadow(self):
+        """
+        Forget all shadowed register values, the next access of each
+        register goes to the bus
 
-        return False
+        :return: Nothing
+        :rtype: Void
+        """
+        self._shadow = {}
+
+    # Read a byte register, from the shadow if it is stable and known.
+    def _read_register(self, register):
+        if self.shadow_registers and register in self.STABLE_REGISTERS:
+            value = self._shadow.get(register)
+            if value is not None:
+                return value
+        value = self._i2c.readByte(self.address, register)
+        self._shadow[register] = value
+        return value
+
+    # Base for a pop request write: the last status read if shadowing,
+    # otherwise a fresh read.
+    def _queue_status(self, register):
+        if self.shadow_registers:
+            value = self._shadow.get(register)
+            if value is not None:
+                return value
+        return self._read_register(register)
+
+    # Write a byte (or word) register, skipped if it already holds value.
+    def _write_register(self, register, value, word=False):
+        with self._i2c:
+            if self.shadow_registers and self._shadow.get(register) == value:
+                return
+            # Unknown until the write has gone through.
+            self._shadow.pop(register, None)
+            if word:
+                self._i2c.writeWord(self.address, register, value)
+            else:
+                self._i2c.writeByte(self.address, register, value)
+            if register in self.STABLE_REGISTERS:
+                self._shadow[register] = value
 
     # ------------------------------------------------
     # get_firmware_version()
@@ -200,9 +272,10 @@ class QwiicButton(object):
         :return: 16 bytes version number
         :rtype: int
         """
-        version = self._i2c.readByte(self.address, self.FIRMWARE_MAJOR) << 8
-        version |= self._i2c.readByte(self.address, self.FIRMWARE_MINOR)
-        return version
+        with self._i2c:
+            version = self._i2c.readByte(self.address, self.FIRMWARE_MAJOR) << 8
+            version |= self._i2c.readByte(self.address, self.FIRMWARE_MINOR)
+            return version
 
     # -------------------------------------------------
     # set_I2C_address(new_address)
@@ -291,9 +364,15 @@ class QwiicButton(object):
         :return: debounce time in milliseconds
         :rtype: int
         """
-        time_list = self._i2c.readBlock(self.address, self.BUTTON_DEBOUNCE_TIME, 2)
-        time = int(time_list[0]) + int(time_list[1]) * 16 ** (2)
-        return time
+        with self._i2c:
+            if self.shadow_registers:
+                time = self._shadow.get(self.BUTTON_DEBOUNCE_TIME)
+                if time is not None:
+                    return time
+            time_list = self._i2c.readBlock(self.address, self.BUTTON_DEBOUNCE_TIME, 2)
+            time = int(time_list[0]) + int(time_list[1]) * 16 ** (2)
+            self._shadow[self.BUTTON_DEBOUNCE_TIME] = time
+            return time
 
     # -------------------------------------------------------
     # set_debounce_time(time)
@@ -318,7 +397,7 @@ class QwiicButton(object):
         time2 = time2 >> 8
         time_list = [time1, time2]
         # Then write two bytes
-        self._i2c.writeWord(self.address, self.BUTTON_DEBOUNCE_TIME, time)
+        self._write_register(self.BUTTON_DEBOUNCE_TIME, time, word=True)
 
     # -------------------------------------------------------
     # enable_pressed_interrupt()
@@ -333,13 +412,14 @@ class QwiicButton(object):
         :return: Nothing
         :rtype: Void
         """
-        # First, read the INTERRUPT_CONFIG register
-        interrupt_config = self._i2c.readByte(self.address, self.INTERRUPT_CONFIG)
-        self.pressed_enable = 1
-        # Set the pressed_enable bit
-        interrupt_config = interrupt_config | (self.pressed_enable << 1)
-        # Write the new interrupt configure byte
-        self._i2c.writeByte(self.address, self.INTERRUPT_CONFIG, interrupt_config)
+        with self._i2c:
+            # First, read the INTERRUPT_CONFIG register
+            interrupt_config = self._read_register(self.INTERRUPT_CONFIG)
+            self.pressed_enable = 1
+            # Set the pressed_enable bit
+            interrupt_config = interrupt_config | (self.pressed_enable << 1)
+            # Write the new interrupt configure byte
+            self._write_register(self.INTERRUPT_CONFIG, interrupt_config)
 
     # -------------------------------------------------------
     # disable_pressed_interrupt()
@@ -354,13 +434,14 @@ class QwiicButton(object):
         :return: Nothing
         :rtype: Void
         """
-        # First, read the INTERRUPT_CONFIG register
-        interrupt_config = self._i2c.readByte(self.address, self.INTERRUPT_CONFIG)
-        self.pressed_enable = 0
-        # Clear the pressed_enable bit
-        interrupt_config = interrupt_config & ~(1 << 1)
-        # Write the new interrupt configure byte
-        self._i2c.writeByte(self.address, self.INTERRUPT_CONFIG, interrupt_config)
+        with self._i2c:
+            # First, read the INTERRUPT_CONFIG register
+            interrupt_config = self._read_register(self.INTERRUPT_CONFIG)
+            self.pressed_enable = 0
+            # Clear the pressed_enable bit
+            interrupt_config = interrupt_config & ~(1 << 1)
+            # Write the new interrupt configure byte
+            self._write_register(self.INTERRUPT_CONFIG, interrupt_config)
 
     # -------------------------------------------------------
     # enable_clicked_interrupt()
@@ -375,13 +456,14 @@ class QwiicButton(object):
         :return: Nothing
         :rtype: Void
         """
-        # First, read the INTERRUPT_CONFIG register
-        interrupt_config = self._i2c.readByte(self.address, self.INTERRUPT_CONFIG)
-        self.clicked_enable = 1
-        # Set the clicked_enable bit
-        interrupt_config = interrupt_config | self.clicked_enable
-        # Write the new interrupt configure byte
-        self._i2c.writeByte(self.address, self.INTERRUPT_CONFIG, interrupt_config)
+        with self._i2c:
+            # First, read the INTERRUPT_CONFIG register
+            interrupt_config = self._read_register(self.INTERRUPT_CONFIG)
+            self.clicked_enable = 1
+            # Set the clicked_enable bit
+            interrupt_config = interrupt_config | self.clicked_enable
+            # Write the new interrupt configure byte
+            self._write_register(self.INTERRUPT_CONFIG, interrupt_config)
 
     # -------------------------------------------------------
     # disable_clicked_interrupt()
@@ -397,13 +479,14 @@ class QwiicButton(object):
         :return: Nothing
         :rtype: Void
         """
-        # First, read the INTERRUPT_CONFIG register
-        interrupt_config = self._i2c.readByte(self.address, self.INTERRUPT_CONFIG)
-        self.clicked_enable = 0
-        # Clear the clicked_enable bit
-        interrupt_config = interrupt_config & (self.clicked_enable)
-        # Write the new interrupt configure byte
-        self._i2c.writeByte(self.address, self.INTERRUPT_CONFIG, interrupt_config)
+        with self._i2c:
+            # First, read the INTERRUPT_CONFIG register
+            interrupt_config = self._read_register(self.INTERRUPT_CONFIG)
+            self.clicked_enable = 0
+            # Clear the clicked_enable bit
+            interrupt_config = interrupt_config & (self.clicked_enable)
+            # Write the new interrupt configure byte
+            self._write_register(self.INTERRUPT_CONFIG, interrupt_config)
 
     # -------------------------------------------------------
     # available()
@@ -437,12 +520,13 @@ class QwiicButton(object):
         :return: Nothing
         :rtype: Void
         """
-        # First, read BUTTON_STATUS register
-        button_status = self._i2c.readByte(self.address, self.BUTTON_STATUS)
-        # Convert to binary and clear the last three bits
-        button_status = int(button_status) & ~(0x7)
-        # Write to BUTTON_STATUS register
-        self._i2c.writeByte(self.address, self.BUTTON_STATUS, button_status)
+        with self._i2c:
+            # First, read BUTTON_STATUS register
+            button_status = self._i2c.readByte(self.address, self.BUTTON_STATUS)
+            # Convert to binary and clear the last three bits
+            button_status = int(button_status) & ~(0x7)
+            # Write to BUTTON_STATUS register
+            self._i2c.writeByte(self.address, self.BUTTON_STATUS, button_status)
 
     # -------------------------------------------------------
     # reset_interrupt_config()
@@ -456,17 +540,18 @@ class QwiicButton(object):
         :return: Nothing
         :rtype: Void
         """
-        self.pressed_enable = 1
-        self.clicked_enable = 1
-        # write 0b11 to the INTERRUPT_CONFIG register
-        self._i2c.writeByte(self.address, self.INTERRUPT_CONFIG, 0b11)
-        self.event_available = 0
-        # Clear has_been_clicked, is_pressed too
-        # TODO: not sure if this is right
-        self.has_been_clicked = 0
-        self.is_pressed = 0
-        # Clear the BUTTON_STATUS register by writing a 0
-        self._i2c.writeByte(self.address, self.BUTTON_STATUS, 0x00)
+        with self._i2c:
+            self.pressed_enable = 1
+            self.clicked_enable = 1
+            # write 0b11 to the INTERRUPT_CONFIG register
+            self._write_register(self.INTERRUPT_CONFIG, 0b11)
+            self.event_available = 0
+            # Clear has_been_clicked, is_pressed too
+            # TODO: not sure if this is right
+            self.has_been_clicked = 0
+            self.is_pressed = 0
+            # Clear the BUTTON_STATUS register by writing a 0
+            self._i2c.writeByte(self.address, self.BUTTON_STATUS, 0x00)
 
     # -------------------------------------------------------
     # is_pressed_queue_full()
@@ -481,7 +566,7 @@ class QwiicButton(object):
         :rtype: bool
         """
         # First, read the PRESSED_QUEUE_STATUS register
-        pressed_queue_stat = self._i2c.readByte(self.address, self.PRESSED_QUEUE_STATUS)
+        pressed_queue_stat = self._read_register(self.PRESSED_QUEUE_STATUS)
         # Convert to binary and clear all bits but isFull
         self.pressed_is_full = int(pressed_queue_stat) & ~(0xFB)
         self.pressed_is_full = self.pressed_is_full >> 2
@@ -501,7 +586,7 @@ class QwiicButton(object):
         :rtype: bool
         """
         # First, read the PRESSED_QUEUE_STATUS register
-        pressed_queue_stat = self._i2c.readByte(self.address, self.PRESSED_QUEUE_STATUS)
+        pressed_queue_stat = self._read_register(self.PRESSED_QUEUE_STATUS)
         # Convert to binary and clear all bits but is_empty
         self.pressed_is_empty = int(pressed_queue_stat) & ~(0xFD)
         # Shift pressed_is_empty to the zero bit
@@ -523,14 +608,17 @@ class QwiicButton(object):
         :return: PRESSED_QUEUE_FRONT
         :rtype: int
         """
-        time_list = self._i2c.readBlock(self.address, self.PRESSED_QUEUE_FRONT, 4)
-        time = (
-            int(time_list[0])
-            + int(time_list[1]) * 16 ** (2)
-            + int(time_list[2]) * 16 ** (4)
-            + int(time_list[3]) * 16 ** (6)
-        )
-        return time
+        with self._i2c:
+            time_list = self._i2c.readBlockInto(
+                self.address, self.PRESSED_QUEUE_FRONT, self._time_buf
+            )
+            time = (
+                int(time_list[0])
+                + int(time_list[1]) * 16 ** (2)
+                + int(time_list[2]) * 16 ** (4)
+                + int(time_list[3]) * 16 ** (6)
+            )
+            return time
 
     # -------------------------------------------------------
     # time_since_first_press()
@@ -546,14 +634,17 @@ class QwiicButton(object):
         :return: PRESSED_QUEUE_BACK
         :rtype: int
         """
-        time_list = self._i2c.readBlock(self.address, self.PRESSED_QUEUE_BACK, 4)
-        time = (
-            int(time_list[0])
-            + int(time_list[1]) * 16 ** (2)
-            + int(time_list[2]) * 16 ** (4)
-            + int(time_list[3]) * 16 ** (6)
-        )
-        return time
+        with self._i2c:
+            time_list = self._i2c.readBlockInto(
+                self.address, self.PRESSED_QUEUE_BACK, self._time_buf
+            )
+            time = (
+                int(time_list[0])
+                + int(time_list[1]) * 16 ** (2)
+                + int(time_list[2]) * 16 ** (4)
+                + int(time_list[3]) * 16 ** (6)
+            )
+            return time
 
     # -------------------------------------------------------
     # pop_pressed_queue()
@@ -569,15 +660,18 @@ class QwiicButton(object):
         :return: PRESSED_QUEUE_BACK
         :rtype: int
         """
-        # Get the time in milliseconds since the button was first pressed
-        temp_data = self.time_since_first_press()
-        # Read PRESSED_QUEUE_STATUS register
-        pressed_queue_stat = self._i2c.readByte(self.address, self.PRESSED_QUEUE_STATUS)
-        self.pressed_pop_request = 1
-        # Set pop_request bit to 1
-        pressed_queue_stat = pressed_queue_stat | (self.pressed_pop_request)
-        self._i2c.writeByte(self.address, self.PRESSED_QUEUE_STATUS, pressed_queue_stat)
-        return temp_data
+        with self._i2c:
+            # Get the time in milliseconds since the button was first pressed
+            temp_data = self.time_since_first_press()
+            # Read PRESSED_QUEUE_STATUS register, unless it is shadowed
+            pressed_queue_stat = self._queue_status(self.PRESSED_QUEUE_STATUS)
+            self.pressed_pop_request = 1
+            # Set pop_request bit to 1
+            pressed_queue_stat = pressed_queue_stat | (self.pressed_pop_request)
+            self._i2c.writeByte(
+                self.address, self.PRESSED_QUEUE_STATUS, pressed_queue_stat
+            )
+            return temp_data
 
     # ---------------------------------------------------------
     # is_clicked_queue_full()
@@ -592,7 +686,7 @@ class QwiicButton(object):
         :rtype: bool
         """
         # First, read the CLICKED_QUEUE_STATUS register
-        clicked_queue_stat = self._i2c.readByte(self.address, self.CLICKED_QUEUE_STATUS)
+        clicked_queue_stat = self._read_register(self.CLICKED_QUEUE_STATUS)
         # Convert to binary and clear all bits but clicked_is_full
         self.clicked_is_full = int(clicked_queue_stat) & ~(0xFB)
         self.clicked_is_full = self.clicked_is_full >> 2
@@ -612,7 +706,7 @@ class QwiicButton(object):
         :rtype: bool
         """
         # First, read the CLICKED_QUEUE_STATUS register
-        clicked_queue_stat = self._i2c.readByte(self.address, self.CLICKED_QUEUE_STATUS)
+        clicked_queue_stat = self._read_register(self.CLICKED_QUEUE_STATUS)
         # Convert to binary and clear all bits but clicked_is_empty
         self.clicked_is_empty = int(clicked_queue_stat) & ~(0xFD)
         # Shift clicked_is_empty to the zero bit
@@ -620,6 +714,24 @@ class QwiicButton(object):
         # Return clicked_is_empty as a bool
         return bool(self.clicked_is_empty)
 
+    # ----------------------------------------------------------
+    # read_clicked_queue_status()
+    #
+    # Reads the CLICKED_QUEUE_STATUS register once and updates both the
+    # clicked_is_empty and clicked_is_full flags from it.
+    def read_clicked_queue_status(self):
+        """
+        Reads the CLICKED_QUEUE_STATUS register and updates clicked_is_empty
+        and clicked_is_full in a single transaction
+
+        :return: CLICKED_QUEUE_STATUS
+        :rtype: int
+        """
+        clicked_queue_stat = self._read_register(self.CLICKED_QUEUE_STATUS)
+        self.clicked_is_empty = (int(clicked_queue_stat) & 0x02) >> 1
+        self.clicked_is_full = (int(clicked_queue_stat) & 0x04) >> 2
+        return clicked_queue_stat
+
     # ------------------------------------------------------------
     # time_since_last_click()
     #
@@ -634,14 +746,17 @@ class QwiicButton(object):
         :return: CLICKED_QUEUE_FRONT
         :rtype: int
         """
-        time_list = self._i2c.readBlock(self.address, self.CLICKED_QUEUE_FRONT, 4)
-        time = (
-            int(time_list[0])
-            + int(time_list[1]) * 16 ** (2)
-            + int(time_list[2]) * 16 ** (4)
-            + int(time_list[3]) * 16 ** (6)
-        )
-        return time
+        with self._i2c:
+            time_list = self._i2c.readBlockInto(
+                self.address, self.CLICKED_QUEUE_FRONT, self._time_buf
+            )
+            time = (
+                int(time_list[0])
+                + int(time_list[1]) * 16 ** (2)
+                + int(time_list[2]) * 16 ** (4)
+                + int(time_list[3]) * 16 ** (6)
+            )
+            return time
 
     # ------------------------------------------------------------
     # time_since_first_click()
@@ -657,14 +772,17 @@ class QwiicButton(object):
         :return: CLICKED_QUEUE_BACK
         :rtype: int
         """
-        time_list = self._i2c.readBlock(self.address, self.CLICKED_QUEUE_BACK, 4)
-        time = (
-            int(time_list[0])
-            + int(time_list[1]) * 16 ** (2)
-            + int(time_list[2]) * 16 ** (4)
-            + int(time_list[3]) * 16 ** (6)
-        )
-        return time
+        with self._i2c:
+            time_list = self._i2c.readBlockInto(
+                self.address, self.CLICKED_QUEUE_BACK, self._time_buf
+            )
+            time = (
+                int(time_list[0])
+                + int(time_list[1]) * 16 ** (2)
+                + int(time_list[2]) * 16 ** (4)
+                + int(time_list[3]) * 16 ** (6)
+            )
+            return time
 
     # -------------------------------------------------------------
     # pop_clicked_queue()
@@ -680,15 +798,60 @@ class QwiicButton(object):
         :return: CLICKED_QUEUE_BACK
         :rtype: int
         """
-        # Get the time in milliseconds since the button was first clicked
-        temp_data = self.time_since_first_click()
-        # Read CLICKED_QUEUE_STATUS register
-        clicked_queue_stat = self._i2c.readByte(self.address, self.CLICKED_QUEUE_STATUS)
-        self.clicked_pop_request = 1
-        # Set pop_request bit to 1
-        clicked_queue_stat = clicked_queue_stat | (self.clicked_pop_request)
-        self._i2c.writeByte(self.address, self.CLICKED_QUEUE_STATUS, clicked_queue_stat)
-        return temp_data
+        with self._i2c:
+            # Get the time in milliseconds since the button was first clicked
+            temp_data = self.time_since_first_click()
+            # Read CLICKED_QUEUE_STATUS register, unless it is shadowed
+            clicked_queue_stat = self._queue_status(self.CLICKED_QUEUE_STATUS)
+            self.clicked_pop_request = 1
+            # Set pop_request bit to 1
+            clicked_queue_stat = clicked_queue_stat | (self.clicked_pop_request)
+            self._i2c.writeByte(
+                self.address, self.CLICKED_QUEUE_STATUS, clicked_queue_stat
+            )
+            return temp_data
+
+    # -------------------------------------------------------------
+    # drain_clicked_queue(max_items, values)
+    #
+    # Pops every value in the clicked queue in a single pass and returns
+    # them oldest first. Each status read is reused both to check for
+    # an empty queue and as the base for the pop request write.
+    def drain_clicked_queue(self, max_items=15, values=None):
+        """
+        Pop all entries of the clicked queue. The queue holds at most 15
+        entries, max_items bounds the loop in case of a misbehaving bus.
+
+        Pass a list as values to keep what was popped if a bus error
+        interrupts the drain: each value is appended once its pop request
+        has been written, so it is no longer on the button.
+
+        :param max_items: the maximum number of entries to pop
+        :param values: list to append the popped values to
+        :return: list of CLICKED_QUEUE_BACK values, oldest first
+        :rtype: list
+        """
+        if values is None:
+            values = []
+        popped = 0
+        with self._i2c:
+            while popped < max_items:
+                # Read CLICKED_QUEUE_STATUS register
+                clicked_queue_stat = self._read_register(self.CLICKED_QUEUE_STATUS)
+                self.clicked_is_empty = (int(clicked_queue_stat) & 0x02) >> 1
+                if self.clicked_is_empty:
+                    break
+                value = self.time_since_first_click()
+                self.clicked_pop_request = 1
+                # Set pop_request bit to 1
+                self._i2c.writeByte(
+                    self.address,
+                    self.CLICKED_QUEUE_STATUS,
+                    clicked_queue_stat | self.clicked_pop_request,
+                )
+                values.append(value)
+                popped += 1
+            return values
 
     # -------------------------------------------------------------
     # LED_config(brightness, cycle_time, off_time, granularity)
@@ -711,14 +874,15 @@ class QwiicButton(object):
         :return: Nothing
         :rtype: Void
         """
-        # Write brightness
-        self._i2c.writeByte(self.address, self.LED_BRIGHTNESS, brightness)
-        # Write cycle_time
-        self._i2c.writeWord(self.address, self.LED_PULSE_CYCLE_TIME, cycle_time)
-        # Write off_time
-        self._i2c.writeWord(self.address, self.LED_PULSE_OFF_TIME, off_time)
-        # Write granularity
-        self._i2c.writeByte(self.address, self.LED_PULSE_GRANULARITY, granularity)
+        with self._i2c:
+            # Write brightness
+            self._write_register(self.LED_BRIGHTNESS, brightness)
+            # Write cycle_time
+            self._write_register(self.LED_PULSE_CYCLE_TIME, cycle_time, word=True)
+            # Write off_time
+            self._write_register(self.LED_PULSE_OFF_TIME, off_time, word=True)
+            # Write granularity
+            self._write_register(self.LED_PULSE_GRANULARITY, granularity)
 
     # --------------------------------------------------------------
     # LED_off()
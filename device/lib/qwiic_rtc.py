@@ -17,6 +17,9 @@ class QwiicRTC(object):
     def __init__(self, i2c_driver, address=0x32):
         self.address = address
         self._i2c = i2c_driver
+        # Reused by every time read, so reading the clock doesn't allocate
+        # (beyond the tuple time.mktime needs).
+        self._time_buf = bytearray(8)
 
     def is_connected(self):
         """Determine if a Qwiic RTC device is connected to the system."""
@@ -38,25 +41,30 @@ class QwiicRTC(object):
 
     def get_epoch_time(self):
         """Return seconds since epoch."""
-        # Read N bytes starting at the HUNDREDTHS register.
-        # The next 8 register represent the rest of the date and time.
-        [_, seconds, minutes, hours, _, date, month, year] = [
-            self.bcd_to_dec(v)
-            for v in self._i2c.read_block(self.address, self.HUNDREDTHS, 8)
-        ]
-        return time.mktime(
-            (
-                year + 2000,
-                month,
-                date,
-                hours,
-                minutes,
-                seconds,
-                0,
-                0,
-                -1,
+        return self.get_precise_epoch_time()[0]
+
+    def get_precise_epoch_time(self):
+        """Return (seconds since epoch, hundredths of a second)."""
+        with self._i2c:
+            # Read N bytes starting at the HUNDREDTHS register.
+            # The next 8 register represent the rest of the date and time
+            # (hundredths, seconds, minutes, hours, weekday, date, month, year).
+            t = self._i2c.read_block_into(self.address, self.HUNDREDTHS, self._time_buf)
+            bcd_to_dec = self.bcd_to_dec
+            epoch_time = time.mktime(
+                (
+                    bcd_to_dec(t[7]) + 2000,
+                    bcd_to_dec(t[6]),
+                    bcd_to_dec(t[5]),
+                    bcd_to_dec(t[3]),
+                    bcd_to_dec(t[2]),
+                    bcd_to_dec(t[1]),
+                    0,
+                    0,
+                    -1,
+                )
             )
-        )
+            return epoch_time, bcd_to_dec(t[0])
 
     def set_time(self, seconds, minutes, hours, date, month, year):
         """Set RTC.
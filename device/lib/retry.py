@@ -0,0 +1,78 @@
+"""Retry policy for uploads: exponential backoff, jitter and a circuit breaker.
+
+After a failure the next attempt is delayed by base_ms * factor ** n, capped at
+max_ms, with up to jitter * delay randomly shaved off so devices don't retry in
+lockstep. After max_attempts consecutive failures the breaker opens and no
+attempts are allowed for cooldown_ms. Then a single trial is allowed
+(half-open): success closes the breaker, failure opens it again.
+"""
+
+import time
+
+try:
+    from urandom import getrandbits
+except ImportError:
+    from random import getrandbits
+
+# Breaker states.
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half-open"
+
+
+class RetryPolicy(object):
+    def __init__(
+        self,
+        base_ms=1000,
+        max_ms=2 * 60 * 1000,
+        factor=2,
+        jitter=0.5,
+        max_attempts=6,
+        cooldown_ms=10 * 60 * 1000,
+    ):
+        self.base_ms = base_ms
+        self.max_ms = max_ms
+        self.factor = factor
+        self.jitter = jitter
+        self.max_attempts = max_attempts
+        self.cooldown_ms = cooldown_ms
+        self.state = CLOSED
+        # Consecutive failures since the last success.
+        self.failures = 0
+        # Times the breaker has opened since boot.
+        self.trips = 0
+        self._next_attempt = time.ticks_ms()
+
+    def ready(self):
+        """Return True if an attempt is allowed now."""
+        if time.ticks_diff(self._next_attempt, time.ticks_ms()) > 0:
+            return False
+        if self.state == OPEN:
+            self.state = HALF_OPEN
+        return True
+
+    def wait_ms(self):
+        """Milliseconds until the next attempt is allowed."""
+        return max(0, time.ticks_diff(self._next_attempt, time.ticks_ms()))
+
+    def success(self):
+        self.state = CLOSED
+        self.failures = 0
+        self._next_attempt = time.ticks_ms()
+
+    def failure(self, timeout=False):
+        """Record a failed attempt and return the delay before the next one.
+
+        A timeout has already cost a full deadline of radio time, so it
+        counts as two failures.
+        """
+        self.failures += 2 if timeout else 1
+        if self.state == HALF_OPEN or self.failures >= self.max_attempts:
+            self.state = OPEN
+            self.trips += 1
+            delay = self.cooldown_ms
+        else:
+            delay = min(self.base_ms * self.factor ** (self.failures - 1), self.max_ms)
+            delay -= int(delay * self.jitter) * getrandbits(8) // 256
+        self._next_attempt = time.ticks_add(time.ticks_ms(), delay)
+        return delay
@@ -0,0 +1,544 @@
+"""Simulated I2C bus with a virtual Qwiic Button and RV-8803, for host runs.
+
+micropython_i2c needs a MicroPython port with machine.I2C, so off the device
+nothing in lib has a bus to talk to. SimI2C is an I2CDriver for CPython that
+routes every transaction to simulated devices by address. The devices keep a
+register map like the real parts do, so the Qwiic drivers run unchanged:
+
+- SimQwiicButton: ID, status and interrupt config, the 15-entry pressed and
+  clicked queues read back as ages (its 32-bit millis() minus the event
+  time), pop requests and the empty/full status bits, debounce, LED and
+  address registers.
+- SimRV8803: BCD time registers (hundredths through year, and the 0x00
+  mirror), setting the time from a block write.
+
+Devices follow a shared SimClock, which only moves when advanced, so a run
+can click far faster than a finger and still finish instantly:
+
+    clock = simi2c.SimClock()
+    simi2c.install_ticks(clock)
+    button = simi2c.SimQwiicButton(clock)
+    rtc = simi2c.SimRV8803(clock, epoch=1715408340)
+    i2c_driver = simi2c.SimI2C([button, rtc], clock=clock, transaction_us=300)
+    qbutton = qwiic_button.QwiicButton(address=None, i2c_driver=i2c_driver)
+    ...
+    button.click()
+    clock.advance(100)
+
+Reads of an address with no device raise OSError(ENODEV), like machine.I2C.
+"""
+
+import calendar
+import time
+
+from i2c_driver import I2CDriver
+
+ENODEV = 19
+MILLIS_MASK = 0xFFFFFFFF
+# MicroPython's ticks wrap at 2**30 on most ports.
+TICKS_MASK = 0x3FFFFFFF
+
+
+class SimClock(object):
+    """Simulated time, in microseconds, that only moves when advanced.
+
+    Calling the clock returns milliseconds.
+    """
+
+    def __init__(self, ms=0):
+        self.us = ms * 1000
+
+    def __call__(self):
+        return self.us // 1000
+
+    def advance(self, ms):
+        self.us += int(ms * 1000)
+
+    def advance_us(self, us):
+        self.us += us
+
+
+class WallClock(object):
+    """The host's monotonic clock, with SimClock's interface.
+
+    For install_ticks() in runs that wait on real sockets or threads.
+    Advancing it sleeps.
+    """
+
+    def __init__(self):
+        self._start = time.monotonic()
+
+    @property
+    def us(self):
+        return int((time.monotonic() - self._start) * 1000000)
+
+    def __call__(self):
+        return self.us // 1000
+
+    def advance(self, ms):
+        time.sleep(ms / 1000.0)
+
+
+# The MicroPython time functions install_ticks() provides.
+TICKS_FUNCTIONS = ("ticks_ms", "ticks_us", "ticks_add", "ticks_diff", "sleep_ms")
+
+
+def install_ticks(clock):
+    """Give CPython's time module the MicroPython ticks functions.
+
+    They follow clock, so code using time.ticks_ms() (the poller, the
+    scheduler) runs on simulated time. time.sleep_ms() advances clock.
+    Returns a function that puts back what time had before, so runs on
+    different clocks can share a process:
+
+        restore = simi2c.install_ticks(clock)
+        try:
+            ...
+        finally:
+            restore()
+    """
+    saved = dict((name, getattr(time, name, None)) for name in TICKS_FUNCTIONS)
+    time.ticks_ms = lambda: clock() & TICKS_MASK
+    time.ticks_us = lambda: clock.us & TICKS_MASK
+    time.ticks_add = lambda ticks, delta: (ticks + delta) & TICKS_MASK
+
+    def ticks_diff(end, start):
+        diff = (end - start) & TICKS_MASK
+        return diff - TICKS_MASK - 1 if diff > TICKS_MASK >> 1 else diff
+
+    time.ticks_diff = ticks_diff
+    time.sleep_ms = clock.advance
+
+    def restore():
+        for name, function in saved.items():
+            if function is not None:
+                setattr(time, name, function)
+            elif hasattr(time, name):
+                delattr(time, name)
+
+    return restore
+
+
+def _u16(value):
+    return bytes((value & 0xFF, (value >> 8) & 0xFF))
+
+
+def _u32(value):
+    return bytes((value >> (8 * i)) & 0xFF for i in range(4))
+
+
+class SimQwiicButton(object):
+    """Register-level model of the Qwiic Button firmware (DEV_ID 0x5D)."""
+
+    ID = 0x00
+    FIRMWARE_MINOR = 0x01
+    FIRMWARE_MAJOR = 0x02
+    BUTTON_STATUS = 0x03
+    INTERRUPT_CONFIG = 0x04
+    BUTTON_DEBOUNCE_TIME = 0x05
+    PRESSED_QUEUE_STATUS = 0x07
+    PRESSED_QUEUE_FRONT = 0x08
+    PRESSED_QUEUE_BACK = 0x0C
+    CLICKED_QUEUE_STATUS = 0x10
+    CLICKED_QUEUE_FRONT = 0x11
+    CLICKED_QUEUE_BACK = 0x15
+    LED_BRIGHTNESS = 0x19
+    LED_PULSE_GRANULARITY = 0x1A
+    LED_PULSE_CYCLE_TIME = 0x1B
+    LED_PULSE_OFF_TIME = 0x1D
+    I2C_ADDRESS = 0x1F
+    REGISTERS = 0x20
+
+    DEV_ID = 0x5D
+    QUEUE_SIZE = 15
+
+    # BUTTON_STATUS bits.
+    EVENT_AVAILABLE = 0x01
+    HAS_BEEN_CLICKED = 0x02
+    IS_PRESSED = 0x04
+    # Queue status bits.
+    POP_REQUEST = 0x01
+    IS_EMPTY = 0x02
+    IS_FULL = 0x04
+
+    def __init__(self, clock, address=0x6F, millis_offset=0, firmware=(1, 3)):
+        """
+        :param clock: the SimClock the button's millis() follows
+        :param millis_offset: added to the clock for millis(), e.g. to test
+            the 32-bit rollover
+        """
+        self.clock = clock
+        self.address = address
+        self.millis_offset = millis_offset
+        self.firmware = firmware
+        self.status = 0
+        self.interrupt_config = 0b11
+        self.debounce_ms = 10
+        self.led_brightness = 0
+        self.led_granularity = 1
+        self.led_cycle_time = 0
+        self.led_off_time = 0
+        # millis() of each event, oldest first.
+        self.pressed = []
+        self.clicked = []
+        # Events that didn't fit in a full queue.
+        self.pressed_dropped = 0
+        self.clicked_dropped = 0
+        self._last_change = None
+
+    def millis(self):
+        return (self.clock() + self.millis_offset) & MILLIS_MASK
+
+    # Button actions ----------------------------------------------------------
+    def _debounced(self, at):
+        # True if a change at millis() value at is a bounce.
+        if self._last_change is None:
+            return False
+        return (at - self._last_change) & MILLIS_MASK < self.debounce_ms
+
+    def _push(self, queue, at):
+        # Returns False if the queue was full and the event is lost.
+        if len(queue) < self.QUEUE_SIZE:
+            queue.append(at)
+            return True
+        return False
+
+    def press(self, ago_ms=0):
+        """Press the button, ago_ms milliseconds ago."""
+        at = (self.millis() - ago_ms) & MILLIS_MASK
+        if self.status & self.IS_PRESSED or self._debounced(at):
+            return
+        self._last_change = at
+        self.status |= self.IS_PRESSED
+        if not self._push(self.pressed, at):
+            self.pressed_dropped += 1
+        if self.interrupt_config & 0x02:
+            self.status |= self.EVENT_AVAILABLE
+
+    def release(self, ago_ms=0):
+        """Release the button, ago_ms milliseconds ago: that's a click."""
+        at = (self.millis() - ago_ms) & MILLIS_MASK
+        if not self.status & self.IS_PRESSED or self._debounced(at):
+            return
+        self._last_change = at
+        self.status &= ~self.IS_PRESSED
+        self.status |= self.HAS_BEEN_CLICKED
+        if not self._push(self.clicked, at):
+            self.clicked_dropped += 1
+        if self.interrupt_config & 0x01:
+            self.status |= self.EVENT_AVAILABLE
+
+    def click(self, hold_ms=None):
+        """Click the button, releasing it now after holding it hold_ms.
+
+        hold_ms defaults to the debounce time, the shortest click that
+        registers.
+        """
+        if hold_ms is None:
+            hold_ms = self.debounce_ms
+        self.press(hold_ms)
+        self.release()
+
+    # Register map ------------------------------------------------------------
+    def _queue_status(self, queue):
+        status = 0
+        if not queue:
+            status |= self.IS_EMPTY
+        if len(queue) >= self.QUEUE_SIZE:
+            status |= self.IS_FULL
+        return status
+
+    def _ages(self, queue):
+        # (front, back): the age of the newest and of the oldest event.
+        if not queue:
+            return 0, 0
+        now = self.millis()
+        return (now - queue[-1]) & MILLIS_MASK, (now - queue[0]) & MILLIS_MASK
+
+    def registers(self):
+        """Return the register map as the firmware would expose it now."""
+        pressed_front, pressed_back = self._ages(self.pressed)
+        clicked_front, clicked_back = self._ages(self.clicked)
+        return (
+            bytes(
+                (
+                    self.DEV_ID,
+                    self.firmware[1],
+                    self.firmware[0],
+                    self.status,
+                    self.interrupt_config,
+                )
+            )
+            + _u16(self.debounce_ms)
+            + bytes((self._queue_status(self.pressed),))
+            + _u32(pressed_front)
+            + _u32(pressed_back)
+            + bytes((self._queue_status(self.clicked),))
+            + _u32(clicked_front)
+            + _u32(clicked_back)
+            + bytes((self.led_brightness, self.led_granularity))
+            + _u16(self.led_cycle_time)
+            + _u16(self.led_off_time)
+            + bytes((self.address,))
+        )
+
+    def read(self, register, nbytes):
+        # The register pointer wraps at the end of the map.
+        regs = self.registers()
+        return bytes(regs[(register + i) % self.REGISTERS] for i in range(nbytes))
+
+    def write(self, register, data):
+        regs = bytearray(self.registers())
+        for i, value in enumerate(data):
+            regs[(register + i) % self.REGISTERS] = value
+        touched = set((register + i) % self.REGISTERS for i in range(len(data)))
+
+        def written(first, size=1):
+            return any(first + i in touched for i in range(size))
+
+        if written(self.BUTTON_STATUS):
+            # Only the three status bits exist.
+            self.status = regs[self.BUTTON_STATUS] & 0x07
+        if written(self.INTERRUPT_CONFIG):
+            self.interrupt_config = regs[self.INTERRUPT_CONFIG] & 0x03
+        if written(self.BUTTON_DEBOUNCE_TIME, 2):
+            self.debounce_ms = regs[5] | regs[6] << 8
+        # Only the pop request bit of a queue status is writable.
+        if written(self.PRESSED_QUEUE_STATUS):
+            if regs[self.PRESSED_QUEUE_STATUS] & self.POP_REQUEST and self.pressed:
+                self.pressed.pop(0)
+        if written(self.CLICKED_QUEUE_STATUS):
+            if regs[self.CLICKED_QUEUE_STATUS] & self.POP_REQUEST and self.clicked:
+                self.clicked.pop(0)
+        if written(self.LED_BRIGHTNESS):
+            self.led_brightness = regs[self.LED_BRIGHTNESS]
+        if written(self.LED_PULSE_GRANULARITY):
+            self.led_granularity = regs[self.LED_PULSE_GRANULARITY]
+        if written(self.LED_PULSE_CYCLE_TIME, 2):
+            self.led_cycle_time = regs[0x1B] | regs[0x1C] << 8
+        if written(self.LED_PULSE_OFF_TIME, 2):
+            self.led_off_time = regs[0x1D] | regs[0x1E] << 8
+        if written(self.I2C_ADDRESS):
+            # The firmware ignores addresses outside the 7-bit range.
+            if 0x08 <= regs[self.I2C_ADDRESS] <= 0x77:
+                self.address = regs[self.I2C_ADDRESS]
+
+
+class SimRV8803(object):
+    """Register-level model of the RV-8803 clock's time registers."""
+
+    SECONDS_MIRROR = 0x00
+    HUNDREDTHS = 0x10
+    SECONDS = 0x11
+    YEAR = 0x17
+    REGISTERS = 0x30
+
+    def __init__(self, clock, address=0x32, epoch=946684800):
+        """
+        :param clock: the SimClock the RTC counts with
+        :param epoch: the time when clock reads 0, in Unix seconds (UTC)
+        """
+        self.clock = clock
+        self.address = address
+        # Unix time in milliseconds at clock() == 0.
+        self._base_ms = epoch * 1000
+        # Registers other than the time, e.g. RAM and control.
+        self._other = bytearray(self.REGISTERS)
+
+    def time_ms(self):
+        """Return the clock's time in Unix milliseconds."""
+        return self._base_ms + self.clock()
+
+    def set_time_ms(self, ms):
+        self._base_ms = ms - self.clock()
+
+    @staticmethod
+    def _bcd(value):
+        return ((value // 10) << 4) | (value % 10)
+
+    @staticmethod
+    def _dec(value):
+        return (value >> 4) * 10 + (value & 0x0F)
+
+    def _time_registers(self):
+        # (seconds, minutes, hours, weekday, date, month, year) and hundredths.
+        ms = self.time_ms()
+        t = time.gmtime(ms // 1000)
+        bcd = self._bcd
+        values = bytes(
+            (
+                bcd(t.tm_sec),
+                bcd(t.tm_min),
+                bcd(t.tm_hour),
+                # One bit per weekday, Sunday first.
+                1 << ((t.tm_wday + 1) % 7),
+                bcd(t.tm_mday),
+                bcd(t.tm_mon),
+                bcd(t.tm_year - 2000),
+            )
+        )
+        return values, bcd(ms % 1000 // 10)
+
+    def registers(self):
+        regs = bytearray(self._other)
+        values, hundredths = self._time_registers()
+        regs[self.SECONDS_MIRROR : self.SECONDS_MIRROR + 7] = values
+        regs[self.HUNDREDTHS] = hundredths
+        regs[self.SECONDS : self.YEAR + 1] = values
+        return regs
+
+    def read(self, register, nbytes):
+        regs = self.registers()
+        return bytes(regs[(register + i) % self.REGISTERS] for i in range(nbytes))
+
+    def write(self, register, data):
+        regs = self.registers()
+        before = bytes(regs)
+        for i, value in enumerate(data):
+            regs[(register + i) % self.REGISTERS] = value
+        for i in range(self.REGISTERS):
+            if not self._is_time(i):
+                self._other[i] = regs[i]
+        for first in (self.SECONDS_MIRROR, self.SECONDS):
+            values = regs[first : first + 7]
+            if values == before[first : first + 7]:
+                continue
+            dec = self._dec
+            seconds = calendar.timegm(
+                (
+                    dec(values[6]) + 2000,
+                    dec(values[5]),
+                    dec(values[4]),
+                    dec(values[2]),
+                    dec(values[1]),
+                    dec(values[0]),
+                    0,
+                    0,
+                    0,
+                )
+            )
+            # Writing the seconds clears the hundredths.
+            self.set_time_ms(seconds * 1000)
+
+    def _is_time(self, register):
+        return register < 7 or self.HUNDREDTHS <= register <= self.YEAR
+
+
+class SimI2C(I2CDriver):
+    """I2CDriver that talks to simulated devices.
+
+    :param devices: objects with an address attribute and read(register,
+        nbytes) / write(register, data) methods
+    :param clock: a SimClock to advance by transaction_us per transaction
+    """
+
+    name = "simulated I2C"
+
+    def __init__(self, devices=(), clock=None, transaction_us=0):
+        I2CDriver.__init__(self)
+        self.devices = list(devices)
+        self.clock = clock
+        self.transaction_us = transaction_us
+        self.transactions = 0
+
+    @classmethod
+    def isPlatform(cls):
+        return True
+
+    @classmethod
+    def is_platform(cls):
+        return cls.isPlatform()
+
+    def attach(self, device):
+        self.devices.append(device)
+
+    def detach(self, device):
+        self.devices.remove(device)
+
+    def _device(self, address):
+        self.transactions += 1
+        if self.clock is not None and self.transaction_us:
+            self.clock.advance_us(self.transaction_us)
+        for device in self.devices:
+            if device.address == address:
+                return device
+        raise OSError(ENODEV)
+
+    def _read(self, address, commandCode, nBytes):
+        with self:
+            return self._device(address).read(commandCode, nBytes)
+
+    def _write(self, address, commandCode, data):
+        with self:
+            self._device(address).write(commandCode, data)
+
+    # read commands ----------------------------------------------------------
+    def readWord(self, address, commandCode):
+        data = self._read(address, commandCode, 2)
+        return (data[1] << 8) | data[0]
+
+    def read_word(self, address, commandCode):
+        return self.readWord(address, commandCode)
+
+    def readByte(self, address, commandCode):
+        return self._read(address, commandCode, 1)[0]
+
+    def read_byte(self, address, commandCode=None):
+        return self.readByte(address, commandCode)
+
+    def readBlock(self, address, commandCode, nBytes):
+        return self._read(address, commandCode, nBytes)
+
+    def read_block(self, address, commandCode, nBytes):
+        return self.readBlock(address, commandCode, nBytes)
+
+    def readBlockInto(self, address, commandCode, buf):
+        buf[:] = self._read(address, commandCode, len(buf))
+        return buf
+
+    def read_block_into(self, address, commandCode, buf):
+        return self.readBlockInto(address, commandCode, buf)
+
+    # write commands----------------------------------------------------------
+    def writeCommand(self, address, commandCode):
+        # Only sets the register pointer.
+        self._write(address, commandCode, b"")
+
+    def write_command(self, address, commandCode):
+        return self.writeCommand(address, commandCode)
+
+    def writeWord(self, address, commandCode, value):
+        self._write(address, commandCode, _u16(value))
+
+    def write_word(self, address, commandCode, value):
+        return self.writeWord(address, commandCode, value)
+
+    def writeByte(self, address, commandCode, value):
+        self._write(address, commandCode, bytes((value & 0xFF,)))
+
+    def write_byte(self, address, commandCode, value):
+        return self.writeByte(address, commandCode, value)
+
+    def writeBlock(self, address, commandCode, value):
+        self._write(address, commandCode, bytes(value))
+
+    def write_block(self, address, commandCode, value):
+        return self.writeBlock(address, commandCode, value)
+
+    def isDeviceConnected(self, devAddress):
+        try:
+            with self:
+                self._device(devAddress)
+        except OSError:
+            return False
+        return True
+
+    def is_device_connected(self, devAddress):
+        return self.isDeviceConnected(devAddress)
+
+    def ping(self, devAddress):
+        return self.isDeviceConnected(devAddress)
+
+    def scan(self):
+        """Returns a list of addresses for the devices connected to the I2C bus."""
+        return sorted(device.address for device in self.devices)
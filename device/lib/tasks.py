@@ -0,0 +1,49 @@
+"""Minimal cooperative scheduler.
+
+The Xbee's micropython build has no uasyncio, so tasks are plain generators.
+A task yields the number of milliseconds it wants to sleep before it is
+resumed (None means "run again as soon as possible"). Tasks never preempt
+each other: a task only gives up the processor when it yields.
+"""
+
+import time
+
+
+class Scheduler(object):
+    def __init__(self):
+        # Each entry is [wake_ms, generator, name].
+        self._tasks = []
+
+    def spawn(self, task, name=""):
+        """Add a generator to the run queue, scheduled to run immediately."""
+        self._tasks.append([time.ticks_ms(), task, name])
+
+    def run_once(self):
+        """Resume every task that is due.
+
+        Returns milliseconds until the next task is due, or None if there are
+        no tasks left.
+        """
+        now = time.ticks_ms()
+        for entry in self._tasks[:]:
+            if time.ticks_diff(entry[0], now) > 0:
+                continue
+            try:
+                delay = next(entry[1])
+            except StopIteration:
+                self._tasks.remove(entry)
+                continue
+            entry[0] = time.ticks_add(time.ticks_ms(), delay or 0)
+        if not self._tasks:
+            return None
+        now = time.ticks_ms()
+        return max(0, min(time.ticks_diff(entry[0], now) for entry in self._tasks))
+
+    def run(self):
+        """Run tasks until they have all finished."""
+        while True:
+            delay = self.run_once()
+            if delay is None:
+                return
+            if delay:
+                time.sleep_ms(delay)
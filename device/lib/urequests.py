@@ -16,67 +16,398 @@ NOTE: Due to the extremely small amount of memory available for use on the
       so as to not run out of memory.
       When this functionality is used, the content and text values on
       the Response class are not longer valid.
+
+NOTE: Added Session, which keeps an HTTP/1.1 connection per host alive across
+      requests so repeated requests skip the connect and TLS handshake.
+
+NOTE: Requests are serialized into one preallocated buffer (RequestBuffer)
+      and sent with as few socket writes as possible, usually one.
+
+NOTE: Response.readinto() and Response.iter_content() read the body into a
+      caller-owned buffer, and Response.discard() drops it, without building
+      the whole body in memory.
+
+NOTE: request() and Session.request() take a timeout (seconds, or a
+      Timeouts with total and per-phase limits). Running past a deadline
+      raises RequestTimeout, an OSError subclass that names the phase.
+
+NOTE: Host addresses are cached by the module-level resolver for a TTL so
+      repeated requests skip DNS.
+
+NOTE: Session.pipeline() sends several requests back to back on one
+      HTTP/1.1 connection and yields the responses in order.
+
+NOTE: data may also be a body stream: an iterable of str/bytes-like pieces,
+      an object with readinto(), or a function returning either (which
+      can be retried). It is sent with chunked transfer encoding through
+      the request buffer, so it is never held in memory whole.
+
+NOTE: Every request records per-phase timings, byte counts and connection
+      reuse in the module-level stats (a Stats).
+
+NOTE: arequests has cooperative versions of Session requests for the tasks
+      scheduler.
 """
 
+import time
+
 import usocket
 
+# errno values (and CPython's message) that mean a socket operation timed out.
+_TIMEOUT_ERRORS = (110, 11, "timed out")
+# errno values of a non-blocking connect that hasn't finished yet
+# (EINPROGRESS, EAGAIN).
+_IN_PROGRESS = (115, 11)
+
+
+class RequestTimeout(OSError):
+    """A request ran past one of its deadlines.
+
+    phase is "connect", "tls" or "read" (sending the request and reading the
+    response).
+    """
+
+    def __init__(self, phase):
+        OSError.__init__(self, "request timeout: " + phase)
+        self.phase = phase
+
+
+class Timeouts:
+    """Deadlines for a request, in seconds. None means no limit.
+
+    total bounds the whole request including reading the body, the others
+    bound each phase. Pass an instance, or a number for just a total, as the
+    timeout argument of request()/Session.request().
+    """
+
+    def __init__(self, total=None, connect=None, tls=None, read=None):
+        self.total = total
+        self.connect = connect
+        self.tls = tls
+        self.read = read
+
+
+class _Deadline:
+    # Tracks one request's deadlines against its start time.
+
+    def __init__(self, timeouts):
+        if not isinstance(timeouts, Timeouts):
+            timeouts = Timeouts(total=timeouts)
+        self.timeouts = timeouts
+        self.start = time.ticks_ms()
+
+    def arm(self, s, phase):
+        # Give the socket whatever is left of the phase and total budgets.
+        limit = getattr(self.timeouts, phase)
+        if self.timeouts.total is not None:
+            left = self.timeouts.total - time.ticks_diff(time.ticks_ms(), self.start) / 1000
+            if left <= 0:
+                raise RequestTimeout(phase)
+            if limit is None or left < limit:
+                limit = left
+        s.settimeout(limit)
+
+    def check(self, phase, since):
+        # Raise RequestTimeout if the phase, started at ticks since, or the
+        # whole request has run out of time.
+        now = time.ticks_ms()
+        limit = getattr(self.timeouts, phase)
+        if limit is not None and time.ticks_diff(now, since) >= limit * 1000:
+            raise RequestTimeout(phase)
+        total = self.timeouts.total
+        if total is not None and time.ticks_diff(now, self.start) >= total * 1000:
+            raise RequestTimeout(phase)
+
+
+def _timeout_error(e, phase):
+    # Turn a socket timeout into RequestTimeout, leave other errors alone.
+    if not isinstance(e, RequestTimeout) and e.args and e.args[0] in _TIMEOUT_ERRORS:
+        return RequestTimeout(phase)
+    return e
+
+
+# Request phases timed by Stats.
+PHASES = ("dns", "tls", "connect", "send", "wait", "body")
+DNS = 0
+TLS = 1
+CONNECT = 2
+SEND = 3
+WAIT = 4
+BODY = 5
+
+
+class Stats:
+    """Timing and byte counts for requests, cheap enough to leave on.
+
+    The module-level stats instance is filled in by every request. Set it to
+    None to stop recording, or to an object with the same methods to hook in
+    your own. ms, sent, received and reused describe the most recent request
+    and the total_* values sum all requests since reset(). Phase times are in
+    milliseconds from ticks_ms, indexed by DNS, TLS, CONNECT, SEND, WAIT (for
+    the response head) and BODY. A pipelined exchange counts as one request.
+    """
+
+    def __init__(self):
+        self.ms = [0] * len(PHASES)
+        self.total_ms = [0] * len(PHASES)
+        self.reset()
+
+    def reset(self):
+        for i in range(len(PHASES)):
+            self.ms[i] = 0
+            self.total_ms[i] = 0
+        self.sent = 0
+        self.received = 0
+        self.reused = False
+        self.requests = 0
+        self.reused_requests = 0
+        self.failures = 0
+        self.total_sent = 0
+        self.total_received = 0
+        self.max_request_ms = 0
+        self._start = None
+        self._mark = None
+
+    def begin(self, reused):
+        # A request starts, on a pooled connection if reused.
+        for i in range(len(PHASES)):
+            self.ms[i] = 0
+        self.sent = 0
+        self.received = 0
+        self.reused = reused
+        self._start = self._mark = time.ticks_ms()
+
+    def mark(self, phase):
+        # The phase just ended, charge it the time since the previous mark.
+        if self._start is None:
+            return
+        now = time.ticks_ms()
+        self.ms[phase] += time.ticks_diff(now, self._mark)
+        self._mark = now
+
+    def end(self, ok=True):
+        # The request finished, or failed, add it to the totals.
+        if self._start is None:
+            return
+        elapsed = time.ticks_diff(time.ticks_ms(), self._start)
+        self._start = None
+        for i in range(len(PHASES)):
+            self.total_ms[i] += self.ms[i]
+        self.requests += 1
+        if self.reused:
+            self.reused_requests += 1
+        if not ok:
+            self.failures += 1
+        self.total_sent += self.sent
+        self.total_received += self.received
+        if elapsed > self.max_request_ms:
+            self.max_request_ms = elapsed
+
+    def summary(self):
+        """Return the totals as a dict, e.g. for a status report."""
+        summary = {
+            "requests": self.requests,
+            "reused": self.reused_requests,
+            "failures": self.failures,
+            "sent": self.total_sent,
+            "received": self.total_received,
+            "max_ms": self.max_request_ms,
+        }
+        for i in range(len(PHASES)):
+            summary[PHASES[i] + "_ms"] = self.total_ms[i]
+        return summary
+
+
+# Scratch space for reading off unwanted response bodies.
+_discard_buf = bytearray(64)
+
+
 class Response:
 
-    def __init__(self, f, chunked_response):
+    def __init__(self, f, chunked_response, content_length=None, release=None,
+                 deadline=None, stats=None):
         self.raw = f
         self.encoding = "utf-8"
         self._cached = None
         self._chunked_response = chunked_response
         self._chunk_size = 0
+        self._crlf = bytearray(2)
+        # Body bytes left to read, None if the length is unknown.
+        self._remaining = content_length
+        # Called with (socket, reusable) once the body has been consumed.
+        self._release = release
+        # Deadlines still apply while reading the body.
+        self._deadline = deadline
+        # Ended once the body has been consumed.
+        self._stats = stats
 
-    def close(self):
+    def _done(self):
+        # The whole body has been read, the socket can be reused.
+        if self.raw:
+            if stats:
+                stats.mark(BODY)
+            if self._stats:
+                self._stats.end()
+            if self._release:
+                self._release(self.raw, True)
+            else:
+                self.raw.close()
+            self.raw = None
+
+    def _abort(self):
+        # The body can't be read to its end, the socket can't be reused.
         if self.raw:
-            self.raw.close()
+            if stats:
+                stats.mark(BODY)
+            if self._stats:
+                self._stats.end()
+            if self._release:
+                self._release(self.raw, False)
+            else:
+                self.raw.close()
             self.raw = None
+
+    def close(self):
+        if self.raw and self._release:
+            # Read off what's left of the body so the connection can be
+            # reused; give up on it if that fails.
+            try:
+                self.discard()
+            except OSError:
+                pass
+        self._abort()
         self._cached = None
 
-    def read(self, sz=16 * 1024):
+    def _next_chunk(self):
+        # Read a chunk header, returns False at the end of the body.
+        l = self.raw.readline()
+        #print("chunk line:", l)
+        if l == b"":
+            return False
+        if stats:
+            stats.received += len(l)
+        l = l.split(b";", 1)[0]
+        self._chunk_size = int(l, 16)
+        #print("chunk size:", self._chunk_size)
+        if self._chunk_size == 0:
+            # End of message
+            self.raw.readinto(self._crlf)
+            assert self._crlf == b"\r\n"
+            return False
+        return True
+
+    def _available(self, sz):
+        # How many body bytes may be read next, 0 at the end of the body.
+        if self.raw is None:
+            return 0
         if self._chunked_response:
+            if self._chunk_size == 0 and not self._next_chunk():
+                self._done()
+                return 0
+            return min(sz, self._chunk_size)
+        if self._remaining is not None:
+            if self._remaining == 0:
+                self._done()
+                return 0
+            return min(sz, self._remaining)
+        return sz
+
+    def _consumed(self, n):
+        if not n:
+            # Connection closed, before the end of the body if it had a
+            # length.
+            self._abort()
+        elif self._chunked_response:
+            self._chunk_size -= n
             if self._chunk_size == 0:
-                l = self.raw.readline()
-                #print("chunk line:", l)
-                if l == b"":
-                    return b""
-                l = l.split(b";", 1)[0]
-                self._chunk_size = int(l, 16)
-                #print("chunk size:", self._chunk_size)
-                if self._chunk_size == 0:
-                    # End of message
-                    sep = self.raw.read(2)
-                    assert sep == b"\r\n"
-                    return b""
-            data = self.raw.read(min(sz, self._chunk_size))
-            self._chunk_size -= len(data)
-            if self._chunk_size == 0:
-                sep = self.raw.read(2)
-                assert sep == b"\r\n"
-        else:
-            data = self.raw.read(sz)
+                self.raw.readinto(self._crlf)
+                assert self._crlf == b"\r\n"
+        elif self._remaining is not None:
+            self._remaining -= n
+            if self._remaining == 0:
+                self._done()
+
+    def read(self, sz=16 * 1024):
+        try:
+            if self._deadline and self.raw:
+                self._deadline.arm(self.raw, "read")
+            n = self._available(sz)
+            if not n:
+                return b""
+            data = self.raw.read(n)
+            if stats:
+                stats.received += len(data)
+            self._consumed(len(data))
+        except OSError as e:
+            if self._stats:
+                self._stats.end(False)
+            self._abort()
+            raise _timeout_error(e, "read")
         return data
 
+    def readinto(self, buf, nbytes=None):
+        """Read body bytes into a caller-owned buffer without allocating.
+
+        Returns the number of bytes read, 0 at the end of the body.
+        """
+        if nbytes is None or nbytes > len(buf):
+            nbytes = len(buf)
+        try:
+            if self._deadline and self.raw:
+                self._deadline.arm(self.raw, "read")
+            n = self._available(nbytes)
+            if not n:
+                return 0
+            n = self.raw.readinto(buf, n)
+            if stats:
+                stats.received += n
+            self._consumed(n)
+        except OSError as e:
+            if self._stats:
+                self._stats.end(False)
+            self._abort()
+            raise _timeout_error(e, "read")
+        return n
+
+    def iter_content(self, buf=None, chunk_size=256):
+        """Yield the body piece by piece, following chunked encoding.
+
+        Pieces are memoryviews into one buffer (buf, or a new one of
+        chunk_size), each only valid until the next one is yielded.
+        """
+        if buf is None:
+            buf = bytearray(chunk_size)
+        mv = memoryview(buf)
+        while True:
+            n = self.readinto(buf)
+            if not n:
+                return
+            yield mv[:n]
+
+    def discard(self):
+        """Read off and drop the rest of the body, returns its length."""
+        total = 0
+        while True:
+            n = self.readinto(_discard_buf)
+            if not n:
+                return total
+            total += n
+
     @property
     def content(self):
         if self._cached is None:
             try:
-                if self._chunked_response:
-                    while True:
-                        data = self.read()
-                        if data == b"":
-                            break
-                        if self._cached is None:
-                            self._cached = data
-                        else:
-                            self._cached += data
-                else:
-                    self._cached = self.raw.read()
+                # Join the pieces once instead of growing a bytes object
+                # (and copying it) for every chunk.
+                chunks = []
+                while True:
+                    data = self.read()
+                    if not data:
+                        break
+                    chunks.append(data)
+                self._cached = b"".join(chunks)
             finally:
-                self.raw.close()
-                self.raw = None
+                self._abort()
         return self._cached
 
     @property
@@ -88,8 +419,7 @@ class Response:
         return ujson.loads(self.content)
 
 
-def request(method, url, data=None, json=None, headers={}, stream=None,
-            verify=None, cert=None, request_1_1=False):
+def _parse_url(url):
     try:
         scheme, _, host, path = url.split("/", 3)
     except ValueError:
@@ -99,7 +429,6 @@ def request(method, url, data=None, json=None, headers={}, stream=None,
         port = 80
         proto = usocket.IPPROTO_TCP
     elif scheme == "https:":
-        import ussl
         port = 443
         proto = usocket.IPPROTO_SEC
     else:
@@ -108,70 +437,553 @@ def request(method, url, data=None, json=None, headers={}, stream=None,
     if ":" in host:
         host, port = host.split(":", 1)
         port = int(port)
+    return proto, host, port, path
+
+
+class Resolver:
+    """Caches resolved host addresses for ttl seconds.
+
+    Entries are dropped early when connecting to them fails. hits and misses
+    count lookups served from the cache and from getaddrinfo.
+    """
+
+    def __init__(self, ttl=10 * 60):
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        # (host, port) -> (address, ticks_ms when resolved)
+        self._cache = {}
+
+    def resolve(self, host, port):
+        key = (host, port)
+        entry = self._cache.get(key)
+        if entry and time.ticks_diff(time.ticks_ms(), entry[1]) < self.ttl * 1000:
+            self.hits += 1
+            return entry[0]
+        self.misses += 1
+        addr = usocket.getaddrinfo(host, port)[0][-1]
+        self._cache[key] = (addr, time.ticks_ms())
+        return addr
+
+    def invalidate(self, host, port):
+        self._cache.pop((host, port), None)
 
+    def clear(self):
+        self._cache = {}
+
+
+resolver = Resolver()
+
+
+def _connect(proto, host, port, verify=None, cert=None, deadline=None,
+             blocking=True):
+    # With blocking False the connect is only started, the caller waits
+    # for the socket to become writable.
     s = usocket.socket(usocket.AF_INET, usocket.SOCK_STREAM, proto)
+    phase = "tls"
+    addr = None
     try:
         if proto == usocket.IPPROTO_SEC:
+            import ussl
             wrap_params = {'server_hostname':host}
             if cert is not None:
                 wrap_params['certfile'] = cert[0]
                 wrap_params['keyfile'] = cert[1]
             if verify is not None:
                 wrap_params['ca_certs'] = verify
+            if deadline:
+                deadline.arm(s, phase)
             s = ussl.wrap_socket(s, **wrap_params)
-        s.connect((host, port))
-        if request_1_1:
-            s.write(b"%s /%s HTTP/1.1\r\n" % (method, path))
+            if stats:
+                stats.mark(TLS)
+        # On the Xbee the TLS handshake of an IPPROTO_SEC socket happens
+        # here, so it counts against the connect deadline.
+        phase = "connect"
+        addr = resolver.resolve(host, port)
+        if stats:
+            stats.mark(DNS)
+        if deadline:
+            deadline.arm(s, phase)
+        if blocking:
+            s.connect(addr)
         else:
-            s.write(b"%s /%s HTTP/1.0\r\n" % (method, path))
-        if not "Host" in headers:
-            s.write(b"Host: %s\r\n" % host)
-        s.write(b"Connection: close\r\n")
-        # Iterate over keys to avoid tuple alloc
-        for k in headers:
-            s.write(k)
-            s.write(b": ")
-            s.write(headers[k])
-            s.write(b"\r\n")
-        if json is not None:
-            assert data is None
-            import ujson
-            data = ujson.dumps(json)
-            s.write(b"Content-Type: application/json\r\n")
-        if data:
-            s.write(b"Content-Length: %d\r\n" % len(data))
-        s.write(b"\r\n")
-        if data:
-            s.write(data)
+            s.setblocking(False)
+            try:
+                s.connect(addr)
+            except OSError as e:
+                if e.args[0] not in _IN_PROGRESS:
+                    raise
+        if stats:
+            stats.mark(CONNECT)
+    except OSError as e:
+        if stats:
+            stats.end(False)
+        s.close()
+        if addr is not None:
+            # The address may be stale, look it up again next time.
+            resolver.invalidate(host, port)
+        raise _timeout_error(e, phase)
+    return s
+
+
+_HEX_DIGITS = b"0123456789abcdef"
+# A chunk's size line: four hex digits (chunks stay under 64KiB) and CRLF.
+_CHUNK_HEAD = 6
+# Free space needed to start a chunk in the buffer rather than flush first.
+_CHUNK_MIN = 32
+
+
+def _is_stream(data):
+    return data is not None and not isinstance(
+        data, (str, bytes, bytearray, memoryview))
+
+
+class RequestBuffer:
+    """Serializes a request into one preallocated, reused bytearray.
+
+    The request head, and the body if it fits, go out in a single socket
+    write, which on an IPPROTO_SEC socket is a single TLS record. Only str
+    pieces are copied (encoded); bytes pieces are copied straight into the
+    buffer. writes and requests count socket writes and requests sent, so
+    writes per request can be checked, e.g. on the unix port together with
+    gc.mem_alloc() for allocations.
+    """
+
+    def __init__(self, size=512):
+        if size > 0xFFFF:
+            raise ValueError("request buffer too large")
+        self.buf = bytearray(size)
+        self._mv = memoryview(self.buf)
+        self._len = 0
+        self._sock = None
+        self._chunk = None
+        self.writes = 0
+        self.requests = 0
+
+    def start(self, sock):
+        self._sock = sock
+        self._len = 0
+        self.requests += 1
+
+    def add(self, data):
+        if isinstance(data, str):
+            data = data.encode()
+        n = len(data)
+        if self._len + n > len(self.buf):
+            self.flush()
+            if n > len(self.buf):
+                self._write(data)
+                return
+        self.buf[self._len:self._len + n] = data
+        self._len += n
+
+    def add_int(self, value):
+        # Write the decimal digits without building a string.
+        digits = 1
+        v = value
+        while v >= 10:
+            v //= 10
+            digits += 1
+        if self._len + digits > len(self.buf):
+            self.flush()
+        i = self._len + digits
+        while i > self._len:
+            i -= 1
+            self.buf[i] = 0x30 + value % 10
+            value //= 10
+        self._len += digits
+
+    def add_chunked(self, body):
+        """Add a body stream with chunked transfer encoding.
+
+        Pieces are packed into the buffer, and a reader reads straight into
+        it, so each chunk is as large as the free space in the buffer.
+        """
+        self._chunk = None
+        if hasattr(body, "readinto"):
+            while True:
+                self._open_chunk()
+                n = body.readinto(self._mv[self._len:len(self.buf) - 2])
+                if not n:
+                    break
+                self._len += n
+                self._fill_chunk()
+        else:
+            for piece in body:
+                if isinstance(piece, str):
+                    piece = piece.encode()
+                piece = memoryview(piece)
+                while piece:
+                    self._open_chunk()
+                    n = min(len(piece), len(self.buf) - 2 - self._len)
+                    self.buf[self._len:self._len + n] = piece[:n]
+                    self._len += n
+                    piece = piece[n:]
+                    self._fill_chunk()
+        self._close_chunk()
+        self.add(b"0\r\n\r\n")
+
+    def _open_chunk(self):
+        # Reserve a size line, unless a chunk is already open.
+        if self._chunk is not None:
+            return
+        if len(self.buf) - self._len < _CHUNK_MIN:
+            self.flush()
+        self._chunk = self._len
+        self._len += _CHUNK_HEAD
+
+    def _fill_chunk(self):
+        # Close the chunk and send the buffer once the buffer is full.
+        if self._len == len(self.buf) - 2:
+            self._close_chunk()
+            self.flush()
+
+    def _close_chunk(self):
+        # Fill in the size line, as fixed width hex, and end the chunk.
+        start = self._chunk
+        if start is None:
+            return
+        self._chunk = None
+        size = self._len - start - _CHUNK_HEAD
+        if not size:
+            self._len = start
+            return
+        for i in range(_CHUNK_HEAD - 3, -1, -1):
+            self.buf[start + i] = _HEX_DIGITS[size & 0xF]
+            size >>= 4
+        self.buf[start + _CHUNK_HEAD - 2:start + _CHUNK_HEAD] = b"\r\n"
+        self.buf[self._len:self._len + 2] = b"\r\n"
+        self._len += 2
+
+    def flush(self):
+        if self._len:
+            self._write(self._mv[:self._len])
+            self._len = 0
+
+    def _write(self, data):
+        self._sock.write(data)
+        self.writes += 1
+        if stats:
+            stats.sent += len(data)
+
+
+request_buffer = RequestBuffer()
+stats = Stats()
+
+
+def _send(s, method, host, path, data, json, headers, request_1_1, keep_alive):
+    request_buffer.start(s)
+    _add_request(request_buffer, method, host, path, data, json, headers,
+                 request_1_1, keep_alive)
+    request_buffer.flush()
+    if stats:
+        stats.mark(SEND)
+
+
+def _add_request(b, method, host, path, data, json, headers, request_1_1,
+                 keep_alive):
+    streamed = _is_stream(data)
+    b.add(method)
+    b.add(b" /")
+    b.add(path)
+    # Chunked transfer encoding needs HTTP/1.1.
+    if request_1_1 or streamed:
+        b.add(b" HTTP/1.1\r\n")
+    else:
+        b.add(b" HTTP/1.0\r\n")
+    if not "Host" in headers:
+        b.add(b"Host: ")
+        b.add(host)
+        b.add(b"\r\n")
+    if keep_alive:
+        b.add(b"Connection: keep-alive\r\n")
+    else:
+        b.add(b"Connection: close\r\n")
+    # Iterate over keys to avoid tuple alloc
+    for k in headers:
+        b.add(k)
+        b.add(b": ")
+        b.add(headers[k])
+        b.add(b"\r\n")
+    if json is not None:
+        assert data is None
+        import ujson
+        data = ujson.dumps(json)
+        b.add(b"Content-Type: application/json\r\n")
+    if streamed:
+        b.add(b"Transfer-Encoding: chunked\r\n")
+    elif data:
+        b.add(b"Content-Length: ")
+        b.add_int(len(data))
+        b.add(b"\r\n")
+    b.add(b"\r\n")
+    if streamed:
+        b.add_chunked(data() if callable(data) else data)
+    elif data:
+        b.add(data)
+
 
+def _read_head(s, method):
+    """Read the status line and headers.
+
+    Returns (status, reason, chunked, content_length, keep_alive).
+    """
+    l = s.readline()
+    #print(l)
+    if not l:
+        # The server closed the connection without answering.
+        raise OSError("connection closed")
+    received = len(l)
+    keep_alive = l.startswith(b"HTTP/1.1")
+    l = l.split(None, 2)
+    status = int(l[1])
+    reason = ""
+    if len(l) > 2:
+        reason = l[2].rstrip()
+    chunked = False
+    content_length = None
+    while True:
         l = s.readline()
+        received += len(l)
+        if not l or l == b"\r\n":
+            break
         #print(l)
-        l = l.split(None, 2)
-        status = int(l[1])
-        reason = ""
-        if len(l) > 2:
-            reason = l[2].rstrip()
-        chunked = False
-        while True:
-            l = s.readline()
-            if not l or l == b"\r\n":
-                break
-            #print(l)
-            if l.startswith(b"Transfer-Encoding:"):
-                if b"chunked" in l:
-                    chunked = True
-            elif l.startswith(b"Location:") and not 200 <= status <= 299:
-                raise NotImplementedError("Redirects not yet supported")
-    except OSError:
+        name = l[:l.find(b":") + 1].lower()
+        if name == b"transfer-encoding:":
+            if b"chunked" in l:
+                chunked = True
+        elif name == b"content-length:":
+            content_length = int(l[15:])
+        elif name == b"connection:":
+            if b"close" in l.lower():
+                keep_alive = False
+        elif name == b"location:" and not 200 <= status <= 299:
+            raise NotImplementedError("Redirects not yet supported")
+    if method == "HEAD" or status in (204, 304):
+        content_length = 0
+    if not chunked and content_length is None:
+        # The body runs until the server closes the connection.
+        keep_alive = False
+    if stats:
+        stats.received += received
+        stats.mark(WAIT)
+    return status, reason, chunked, content_length, keep_alive
+
+
+def request(method, url, data=None, json=None, headers={}, stream=None,
+            verify=None, cert=None, request_1_1=False, timeout=None):
+    deadline = _Deadline(timeout) if timeout is not None else None
+    proto, host, port, path = _parse_url(url)
+    if stats:
+        stats.begin(False)
+    s = _connect(proto, host, port, verify, cert, deadline)
+    try:
+        if deadline:
+            deadline.arm(s, "read")
+        _send(s, method, host, path, data, json, headers, request_1_1, False)
+        status, reason, chunked, _, _ = _read_head(s, method)
+    except OSError as e:
+        if stats:
+            stats.end(False)
         s.close()
-        raise
+        raise _timeout_error(e, "read")
 
-    resp = Response(s, chunked)
+    resp = Response(s, chunked, deadline=deadline, stats=stats)
     resp.status_code = status
     resp.reason = reason
     return resp
 
 
+def _send_all(s, host, requests):
+    # Send (method, path, data, json, headers) requests as HTTP/1.1
+    # keep-alive requests, back to back.
+    request_buffer.start(s)
+    for method, path, data, json, headers in requests:
+        _add_request(request_buffer, method, host, path, data, json, headers,
+                     True, True)
+    request_buffer.flush()
+    if stats:
+        stats.mark(SEND)
+
+
+def _one_shot(requests):
+    # True if a request's body is a stream that can only be sent once.
+    for request in requests:
+        data = request[2]
+        if _is_stream(data) and not callable(data):
+            return True
+    return False
+
+
+class Session:
+    """Keeps one HTTP/1.1 connection per host open across requests.
+
+    A connection goes back to the pool once its response body has been fully
+    read (via content/text/json, read() to the end, or close()). If the server
+    closed a pooled connection in the meantime, the request is retried once
+    on a fresh connection.
+    """
+
+    def __init__(self, verify=None, cert=None, timeout=None):
+        self.verify = verify
+        self.cert = cert
+        # Default for requests that don't pass their own timeout.
+        self.timeout = timeout
+        # (proto, host, port) -> idle socket
+        self._pool = {}
+
+    def close(self):
+        for key in self._pool:
+            self._pool[key].close()
+        self._pool = {}
+
+    def _exchange(self, key, host, deadline, requests):
+        # Send (method, path, data, json, headers) requests back to back on
+        # a pooled or new connection, and read the first response's head.
+        proto, _, port = key
+        while True:
+            s = self._pool.pop(key, None)
+            reused = s is not None
+            if stats:
+                stats.begin(reused)
+            if not reused:
+                s = _connect(proto, host, port, self.verify, self.cert, deadline)
+            try:
+                if deadline:
+                    deadline.arm(s, "read")
+                _send_all(s, host, requests)
+                return s, _read_head(s, requests[0][0])
+            except OSError as e:
+                if stats:
+                    stats.end(False)
+                s.close()
+                e = _timeout_error(e, "read")
+                # A timeout already used up the budget, don't retry it. Nor
+                # a body stream that was consumed and can't be restarted.
+                if (not reused or isinstance(e, RequestTimeout)
+                        or _one_shot(requests)):
+                    raise e
+                # The server dropped the idle connection, try a fresh one.
+
+    def request(self, method, url, data=None, json=None, headers={},
+                timeout=None):
+        if timeout is None:
+            timeout = self.timeout
+        deadline = _Deadline(timeout) if timeout is not None else None
+        proto, host, port, path = _parse_url(url)
+        key = (proto, host, port)
+        s, head = self._exchange(key, host, deadline,
+                                 [(method, path, data, json, headers)])
+        return self._response(key, s, head, deadline)
+
+    def _response(self, key, s, head, deadline):
+        # Wrap a single response whose head has been read.
+        status, reason, chunked, length, keep_alive = head
+
+        def release(sock, reusable):
+            if reusable and keep_alive and key not in self._pool:
+                self._pool[key] = sock
+            else:
+                sock.close()
+
+        resp = Response(s, chunked, length, release, deadline, stats)
+        resp.status_code = status
+        resp.reason = reason
+        if length == 0:
+            resp._done()
+        return resp
+
+    def _parse_pipeline(self, requests):
+        # Returns (key, host, [(method, path, data, json, headers)]).
+        key = None
+        parsed = []
+        for method, url, data, headers in requests:
+            proto, host, port, path = _parse_url(url)
+            if key is not None and key != (proto, host, port):
+                raise ValueError("Pipelined requests must share a host")
+            key = (proto, host, port)
+            parsed.append((method, path, data, None, headers))
+        return key, host, parsed
+
+    def pipeline(self, requests, timeout=None):
+        """Send several requests back to back on one connection.
+
+        requests is a list of (method, url, data, headers) tuples, all for
+        the same host. Returns a generator yielding the responses in order.
+        Read each one (or not) before moving on: whatever is left of its
+        body is discarded when the next response is read. The timeout covers
+        the whole exchange.
+        """
+        if timeout is None:
+            timeout = self.timeout
+        deadline = _Deadline(timeout) if timeout is not None else None
+        key, host, parsed = self._parse_pipeline(requests)
+        s, head = self._exchange(key, host, deadline, parsed)
+        return self._responses(key, s, head, deadline, parsed)
+
+    def _responses(self, key, s, head, deadline, parsed):
+        # Yield the pipelined responses, the first one's head has been read.
+        # Set once a response says the connection can't be used further.
+        broken = []
+        last = len(parsed) - 1
+        try:
+            for i in range(len(parsed)):
+                if i:
+                    try:
+                        if broken:
+                            raise OSError("connection closed")
+                        head = _read_head(s, parsed[i][0])
+                    except OSError as e:
+                        if stats:
+                            stats.end(False)
+                        raise _timeout_error(e, "read")
+                status, reason, chunked, length, keep_alive = head
+
+                def release(sock, reusable, keep_alive=keep_alive, i=i):
+                    if not (reusable and keep_alive):
+                        broken.append(True)
+                        sock.close()
+                    elif i == last and key not in self._pool:
+                        self._pool[key] = sock
+                    elif i == last:
+                        sock.close()
+
+                # The exchange ends with the last response.
+                resp = Response(s, chunked, length, release, deadline,
+                                stats if i == last else None)
+                resp.status_code = status
+                resp.reason = reason
+                if length == 0:
+                    resp._done()
+                yield resp
+                # Get the body off the socket before the next head.
+                resp.close()
+                if i == last:
+                    s = None
+        finally:
+            # Abandoned part way: the connection is in an unknown state.
+            if s and not broken and self._pool.get(key) is not s:
+                s.close()
+
+    def head(self, url, **kw):
+        return self.request("HEAD", url, **kw)
+
+    def get(self, url, **kw):
+        return self.request("GET", url, **kw)
+
+    def post(self, url, **kw):
+        return self.request("POST", url, **kw)
+
+    def put(self, url, **kw):
+        return self.request("PUT", url, **kw)
+
+    def patch(self, url, **kw):
+        return self.request("PATCH", url, **kw)
+
+    def delete(self, url, **kw):
+        return self.request("DELETE", url, **kw)
+
+
 def head(url, **kw):
     return request("HEAD", url, **kw)
 
@@ -12,15 +12,28 @@ and a Sparkfun qwiic RTC.
 import time
 
 import ujson
-import usocket
 
 # Use digi studio to copy lib/* -> /flash/lib/
+import arequests
+import capture
+import connectivity
 import credentials
+import eventbuf
+import eventcodec
+import i2ctrace
+import journal
 import micropython_i2c
+import poller
 import qwiic_button
 import qwiic_rtc
+import retry
+import tasks
 import urequests
 
+# Used to measure how long it takes from power-on until clicks are captured.
+BOOT_TICKS = time.ticks_ms()
+# Time every I2C transaction (see i2ctrace) and print a summary with each ping.
+TRACE_I2C = False
 
 print(
     """
@@ -37,165 +50,457 @@ print("device: " + credentials.device_name)
 # Start qwiic button.
 # Init this asap so we can start capturing button presses.
 i2c_driver = micropython_i2c.MicroPythonI2C()
+if TRACE_I2C:
+    i2c_driver = i2ctrace.TracingI2C(i2c_driver)
 qbutton = qwiic_button.QwiicButton(address=None, i2c_driver=i2c_driver)
 print("qwiic button: starting.")
 while not qbutton.begin():
     print("qwiic button: failed to init, retrying..")
     time.sleep(5)
 print("qwiic button: ready.")
-while True:
-    try:
-        print("qwiic button: fw version: " + str(qbutton.get_firmware_version()))
-        time.sleep(0.1)  # Give the i2c bus a break.
-        qbutton.LED_off()
-        break
-    except OSError as e:
-        print("qbutton: error: " + str(e))
-        time.sleep(0.1)
 
-# Start the Qwiic RTC.
+# The Qwiic RTC is brought up by a task once the main loop is running. Until
+# it is ready, clicks wait in the button's own queue where their ages keep
+# counting, so their timestamps are still correct once they are drained.
 qrtc = qwiic_rtc.QwiicRTC(address=0x32, i2c_driver=i2c_driver)
-print("qwiic rtc: starting")
-while not qrtc.begin():
-    print("qwiic rtc: failed to init, retrying..")
-    time.sleep(5)
-print("qwiic rtc: ready")
 
 BASE_URL = "https://whenpress.net"
 HEADERS = {"Content-Type": "application/json"}
 PING_PERIOD = 5 * 60
+# Limits on how many pending events are sent in a single upload. JSON
+# uploads are streamed from the event buffer, so their size isn't bounded by
+# RAM.
+MAX_BATCH_EVENTS = 50
+MAX_JSON_BATCH_EVENTS = 200
+# Upload events in the compact binary encoding (see eventcodec) instead of
+# JSON. The password then travels in a header.
+USE_BINARY_EVENTS = False
+BINARY_HEADERS = {
+    "Content-Type": eventcodec.CONTENT_TYPE,
+    "X-Password": credentials.password,
+}
+# Pending events held in RAM (4 bytes each) before the oldest are dropped.
+EVENT_CAPACITY = 512
+# Button polling backs off from FAST to SLOW once idle for BURST.
+BUTTON_POLL_FAST_MS = 100
+BUTTON_POLL_SLOW_MS = 2000
+BUTTON_POLL_BURST_MS = 10 * 1000
+# How often the other tasks wake up, in milliseconds.
+UPLOAD_POLL_MS = 100
+HEARTBEAT_POLL_MS = 1000
+BOOTSTRAP_RETRY_MS = 5 * 1000
+# Deadlines for each http post, in seconds. The connect phase includes the
+# TLS handshake on the Xbee.
+HTTP_TIMEOUTS = urequests.Timeouts(total=60, connect=30, read=20)
+# Pings due within this many milliseconds ride along with an upload, on the
+# same connection, instead of waking the radio again later.
+PING_PIGGYBACK_MS = 60 * 1000
+# http_post outcomes.
+POST_OK = "ok"
+POST_FAILED = "failed"
+POST_TIMEOUT = "timeout"
 
+# Readiness, set by the bootstrap tasks. Capture waits on the RTC,
+# uploads and pings wait on the network and the clock.
+rtc_ready = False
+network_ready = False
+clock_ready = False
+# Cached network state, updated by every request.
+connection = connectivity.ConnectivityMonitor()
+# Keeps the TLS connection to the server open between requests.
+http_session = urequests.Session()
+# Set while a request is in flight. Uploads and pings wait their turn, so
+# they share the pooled connection and each one's urequests.stats record.
+http_busy = False
+# Holds the start of failed responses' bodies for logging.
+response_preview = bytearray(128)
+# Reused for every binary upload.
+event_payload = bytearray(eventcodec.max_encoded_size(MAX_BATCH_EVENTS))
+# Milliseconds from boot until the first button poll with a working RTC.
+boot_capture_ms = None
+# Events overwritten on overflow that the journal hasn't been told about yet.
+overflow_acks = 0
 
-def is_radio_connected():
+
+def record_event(timestamp):
+    """Buffer a new event in RAM and queue it for the journal.
+
+    It reaches flash with journal_flush(), or sooner if the journal's write
+    buffer fills up.
+    """
+    global overflow_acks
+    dropped = events.dropped
+    if not events.push(timestamp):
+        return
+    if events.dropped != dropped:
+        # The oldest pending event was overwritten, forget it on flash too.
+        overflow_acks += 1
     try:
-        usocket.getaddrinfo("8.8.8.8", 53)
-        return True
-    except:
-        return False
+        event_journal.append(timestamp)
+    except OSError as e:
+        # The event is still buffered in RAM and can be uploaded.
+        print("event journal: error: " + str(e))
 
 
-def http_post(url, headers, data):
-    """Wraps urequests.post.
+def journal_flush():
+    """Write this pass's events and overflow acks to flash.
 
-    Returns boolean indicating success.
+    Flash errors are logged, not raised: capture carries on from RAM.
     """
-    print("http post: " + str(url))
+    global overflow_acks
     try:
-        response = urequests.post(
-            url,
-            headers=headers,
-            data=ujson.dumps(data),
-        )
-    except (OSError, IndexError) as e:
-        print("http post: exception: " + str(e))
-        return False
+        if overflow_acks:
+            # Flushes the queued events first.
+            event_journal.ack(overflow_acks)
+            overflow_acks = 0
+        else:
+            event_journal.flush()
+    except OSError as e:
+        print("event journal: error: " + str(e))
+
+
+def journal_ack(count):
+    """Forget the oldest count pending events on flash, logging errors."""
+    try:
+        event_journal.ack(count)
+    except OSError as e:
+        print("event journal: error: " + str(e))
+
+
+def batch_size(events):
+    """Return how many of the oldest pending events fit in one upload.
+
+    Always at least one event if any are pending.
+    """
+    limit = MAX_BATCH_EVENTS if USE_BINARY_EVENTS else MAX_JSON_BATCH_EVENTS
+    return min(len(events), max(1, limit))
+
+
+def event_json(count):
+    """Yield the JSON upload of the oldest count pending events, in pieces.
+
+    Used as a urequests body stream so the JSON is never built in memory.
+    """
+    yield '{"password": '
+    yield ujson.dumps(credentials.password)
+    yield ', "events": ['
+    for i in range(count):
+        yield '%s{"pressTimestamp": %d}' % (", " if i else "", events.peek(i))
+    yield "]}"
+
+
+def check_response(response):
+    """Return POST_OK for a 200 response, otherwise log it and POST_FAILED."""
     if response.status_code == 200:
         print("http post: success")
-        return True
-    else:
-        print("http post: failed")
-        print("http post: response status code: %s" % response.status_code)
-        print("http post: response reason: %s" % response.reason)
-        print("http post: response text: %s" % response.text)
-        return False
-
-
-# Block until we have connectivity.
-while True:
-    if is_radio_connected():
-        print("network connection: ready.")
-        break
-    else:
-        print("network connection: waiting..")
-        time.sleep(5)
+        return POST_OK
+    print("http post: failed")
+    print("http post: response status code: %s" % response.status_code)
+    print("http post: response reason: %s" % response.reason)
+    # Only show the start of the body, error pages can be large.
+    try:
+        n = response.readinto(response_preview)
+        print("http post: response text: %s" % bytes(response_preview[:n]))
+    except OSError as e:
+        print("http post: exception: " + str(e))
+    return POST_FAILED
+
+
+def http_post_many(posts):
+    """Send several posts back to back on one connection.
+
+    A generator, use it with "yield from" in a task: other tasks keep running
+    while it waits on the network.
+
+    posts is a list of (url, headers, data) tuples for the same host. data is
+    JSON-encoded if it is a dict, bytes-like data and body streams (see
+    urequests) are sent as they are.
+
+    Returns a list with one POST_* outcome per post, in order. If the
+    connection fails part way, the remaining posts get POST_TIMEOUT or
+    POST_FAILED.
+
+    Callers check http_busy first, only one request may be in flight.
+    """
+    global http_busy
+    results = []
+    requests = []
+    for url, headers, data in posts:
+        print("http post: " + str(url))
+        if isinstance(data, dict):
+            data = ujson.dumps(data)
+        requests.append(("POST", url, data, headers))
+
+    def handle(response):
+        # Any response at all means the network path works.
+        connection.record_success()
+        results.append(check_response(response))
 
-# Wait for clock setup.
-# I believe the cell modem needs to connect and bootstrap the Xbee's clock.
-# The time.tz_offset method fails unless you wait about 15s after boot.
-# TODO: could remove this as we no longer need tz_offset
-while True:
+    http_busy = True
     try:
-        time.tz_offset()
-        print("clock boostrap: ready.")
-        break
-    except OSError:
-        print("clock bootstrap: waiting..")
-        time.sleep(5)
+        # Each response's body is dropped after handle(), without building
+        # it in memory, so the connection can be reused.
+        yield from arequests.pipeline(
+            http_session, requests, handle, timeout=HTTP_TIMEOUTS
+        )
+    except urequests.RequestTimeout as e:
+        print("http post: " + str(e))
+        connection.record_failure()
+        results.extend([POST_TIMEOUT] * (len(posts) - len(results)))
+    except (OSError, IndexError) as e:
+        print("http post: exception: " + str(e))
+        connection.record_failure()
+        results.extend([POST_FAILED] * (len(posts) - len(results)))
+    finally:
+        http_busy = False
+    return results
+
+
+def http_post(url, headers, data):
+    """Send a single post, see http_post_many.
+
+    Returns POST_OK on success, POST_TIMEOUT if a deadline passed,
+    otherwise POST_FAILED.
+    """
+    results = yield from http_post_many([(url, headers, data)])
+    return results[0]
+
 
 # Xbee uses 1/1/2000 as epoch start instead of 1/1/1970.
 # To create a more typical UTC timestamp indexed from 1970,
 # we can add the delta in seconds.
 EPOCH_DIFFERENCE = 946684800
-events = []
+events = eventbuf.EventBuffer(EVENT_CAPACITY, policy=eventbuf.DROP_OLDEST)
 last_ping = -PING_PERIOD * 1000  # init so the ping triggers on boot
 
-# Main loop.
-print("device: ready.")
-print("device: starting main loop.")
-while True:
-    # Check for button presses on the Qwiic button.
-    # Technically we're going to use the click queue (press down and release).
-    # I am getting duplicate events when I use the press queue.
+# Replay events that were captured but not uploaded before the last reboot.
+event_journal = journal.Journal()
+for timestamp in event_journal.replay(limit=EVENT_CAPACITY):
+    events.push(timestamp)
+print("event journal: replayed %s events" % len(events))
+
+
+def ping_due(within_ms=0):
+    """Return True if a ping is due, or will be within within_ms."""
+    elapsed = time.ticks_diff(time.ticks_ms(), last_ping)
+    return elapsed > PING_PERIOD * 1000 - within_ms
+
+
+def ping_post():
+    """Return the (url, headers, data) of a ping."""
+    return (
+        BASE_URL + "/" + credentials.device_name + "/ping",
+        HEADERS,
+        {
+            "password": credentials.password,
+            "uploadBreaker": upload_retry.state,
+            "uploadFailures": upload_retry.failures,
+            "uploadTrips": upload_retry.trips,
+            "bootCaptureMs": boot_capture_ms,
+            # Button polls that found the queue full, i.e. lost clicks.
+            "buttonQueueFull": button_poller.full_polls,
+            "network": connection.state,
+            # Request timings and byte counts since boot.
+            "http": urequests.stats.summary(),
+        },
+    )
+
+
+def rtc_bootstrap():
+    """Task: start the Qwiic RTC, then finish button setup."""
+    global rtc_ready
+    print("qwiic rtc: starting")
+    while True:
+        try:
+            rtc_ready = qrtc.begin()
+        except OSError as e:
+            print("qwiic rtc: error: " + str(e))
+        if rtc_ready:
+            break
+        print("qwiic rtc: failed to init, retrying..")
+        yield BOOTSTRAP_RETRY_MS
+    print("qwiic rtc: ready")
+    # Nice-to-have button setup, done after capture has started.
     try:
-        while not qbutton.is_clicked_queue_empty():
-            # The button's queue has millisecond values in it. After some
-            # testing, this is the time relative to the first time in the
-            # queue. Unfortunately it's not the time since boot.
-            # TODO: is there a better way to handle the queue times? E.g. if
-            # we accumulate clicks while we are stuck transmitting.
-            # In most cases this will be fine, we won't be stuck long.
-            # Also ensure that we're dealing with ints; the xbee's micropython
-            # fp math was surprising!
-            events.append(
-                {
-                    "pressTimestamp": sum(
-                        (
-                            int(qrtc.get_epoch_time()),
-                            int(qbutton.pop_clicked_queue() / 1000.0),
-                            EPOCH_DIFFERENCE,
-                        )
-                    )
-                }
-            )
-            # Sleep to give the i2c bus a rest.
-            time.sleep(0.1)
+        print("qwiic button: fw version: " + str(qbutton.get_firmware_version()))
+        qbutton.LED_off()
     except OSError as e:
-        print("error: " + str(e))
-
-    # Pop off individual events and transmit them.
-    if events:
-        print("event tx: event count: %s" % len(events))
-        event = events.pop(0)
-        print("event tx: sending one event")
-        success = http_post(
-            url=BASE_URL + "/" + credentials.device_name + "/data",
-            headers=HEADERS,
-            data={
-                "password": credentials.password,
-                "pressTimestamp": event["pressTimestamp"],
-            },
-        )
+        print("qbutton: error: " + str(e))
 
-        # If transmission succeeds, bump the ping timer:
-        # the tx indicates we have good connectivity.
-        # If it fails, add the event back into the queue.
-        if success:
-            last_ping = time.ticks_ms()
-        else:
-            events.append(event)
-
-    # Periodically send a ping.
-    if time.ticks_diff(time.ticks_ms(), last_ping) > (PING_PERIOD * 1000):
-        print("ping: sending")
-        success = http_post(
-            url=BASE_URL + "/" + credentials.device_name + "/ping",
-            headers=HEADERS,
-            data={
-                "password": credentials.password,
-            },
-        )
-        if success:
-            last_ping = time.ticks_ms()
 
-    # Pause to give the i2c bus a rest.
-    time.sleep(0.1)
+def network_bootstrap():
+    """Task: wait for connectivity and the Xbee's clock."""
+    global network_ready, clock_ready
+    while connection.check() == connectivity.DOWN:
+        print("network connection: waiting..")
+        yield BOOTSTRAP_RETRY_MS
+    network_ready = True
+    print("network connection: ready.")
+
+    # Wait for clock setup.
+    # I believe the cell modem needs to connect and bootstrap the Xbee's
+    # clock. The time.tz_offset method fails unless you wait about 15s after
+    # boot.
+    # TODO: could remove this as we no longer need tz_offset
+    while True:
+        try:
+            time.tz_offset()
+            break
+        except OSError:
+            print("clock bootstrap: waiting..")
+            yield BOOTSTRAP_RETRY_MS
+    clock_ready = True
+    print("clock boostrap: ready.")
+
+
+def button_sampler():
+    """Task: move clicks from the Qwiic button's queue into the event buffer."""
+    global boot_capture_ms
+    while True:
+        # Without the RTC we can't stamp clicks, leave them on the button.
+        if not rtc_ready:
+            yield BUTTON_POLL_FAST_MS
+            continue
+        if boot_capture_ms is None:
+            boot_capture_ms = time.ticks_diff(time.ticks_ms(), BOOT_TICKS)
+            print("device: capturing clicks %s ms after boot" % boot_capture_ms)
+        # Check for button presses on the Qwiic button.
+        # Technically we're going to use the click queue (press down and
+        # release). I am getting duplicate events when I use the press queue.
+        try:
+            # The button's queue holds the age of each click in
+            # milliseconds, see capture and clicktime for how those become
+            # timestamps.
+            click_capture.sample()
+        except OSError as e:
+            print("error: " + str(e))
+        # Persist everything drained in this pass with a single flash write.
+        journal_flush()
+        yield button_poller.interval_ms
+
+
+def uploader():
+    """Task: send pending events to the cloud in batches."""
+    global last_ping
+    while True:
+        # Send as many pending events as fit in one request, unless the
+        # retry policy says we are still backing off after a failure.
+        if (
+            events
+            and network_ready
+            and clock_ready
+            and connection.check() != connectivity.DOWN
+            and not http_busy
+            and upload_retry.ready()
+        ):
+            print("event tx: event count: %s" % len(events))
+            if events.dropped:
+                print("event tx: dropped on overflow: %s" % events.dropped)
+            count = batch_size(events)
+            print("event tx: sending %s events" % count)
+            url = BASE_URL + "/" + credentials.device_name + "/data"
+            # The sampler keeps running while we wait on the network. If the
+            # buffer overflows meanwhile, the oldest events are overwritten
+            # and the head moves on, so note the overflow count as of when
+            # the body was built.
+            dropped_at_send = [events.dropped]
+            if USE_BINARY_EVENTS:
+                # Encode straight from the event buffer, no JSON on the heap.
+                length = eventcodec.encode_into(event_payload, events, count)
+                posts = [(url, BINARY_HEADERS, memoryview(event_payload)[:length])]
+            else:
+                # Stream the JSON from the event buffer. A function, so the
+                # body can be restarted if a pooled connection was dropped.
+                def json_body():
+                    dropped_at_send[0] = events.dropped
+                    return event_json(count)
+
+                posts = [(url, HEADERS, json_body)]
+            # Send a ping that is nearly due on the same connection.
+            if ping_due(PING_PIGGYBACK_MS):
+                print("ping: sending with upload")
+                posts.append(ping_post())
+            results = yield from http_post_many(posts)
+            result = results[0]
+            if len(results) > 1 and results[1] == POST_OK:
+                last_ping = time.ticks_ms()
+
+            # If transmission succeeds, drop the batch and bump the ping
+            # timer: the tx indicates we have good connectivity.
+            # If it fails, the events stay at the front of the queue for a
+            # retry once the backoff delay has passed.
+            if result == POST_OK:
+                upload_retry.success()
+                # Events overwritten since the body was built are already
+                # gone (and acked on flash by the sampler), only remove the
+                # rest of the batch.
+                sent = max(0, count - (events.dropped - dropped_at_send[0]))
+                events.discard(sent)
+                journal_ack(sent)
+                last_ping = time.ticks_ms()
+            else:
+                delay = upload_retry.failure(timeout=result == POST_TIMEOUT)
+                print(
+                    "event tx: retry in %s ms, breaker %s"
+                    % (delay, upload_retry.state)
+                )
+
+        # Reclaim journal space. The log only holds events still pending
+        # (at most EVENT_CAPACITY), so this is cheap even while offline.
+        if event_journal.needs_compaction():
+            try:
+                event_journal.compact()
+            except OSError as e:
+                print("event journal: error: " + str(e))
+        yield UPLOAD_POLL_MS
+
+
+def heartbeat():
+    """Task: periodically send a ping."""
+    global last_ping
+    while True:
+        if (
+            network_ready
+            and clock_ready
+            and connection.check() != connectivity.DOWN
+            and not http_busy
+            and ping_due()
+        ):
+            print("ping: sending")
+            url, headers, data = ping_post()
+            result = yield from http_post(url, headers, data)
+            if TRACE_I2C:
+                i2c_driver.dump()
+            if result == POST_OK:
+                last_ping = time.ticks_ms()
+        yield HEARTBEAT_POLL_MS
+
+
+# Main loop.
+# Capture, upload and ping run as separate cooperative tasks that share the
+# event buffer. Requests yield while they wait on the network, so a slow
+# upload doesn't hold up capture.
+print("device: ready.")
+print("device: starting main loop.")
+button_poller = poller.AdaptivePoller(
+    qbutton,
+    fast_ms=BUTTON_POLL_FAST_MS,
+    slow_ms=BUTTON_POLL_SLOW_MS,
+    burst_ms=BUTTON_POLL_BURST_MS,
+)
+click_capture = capture.ClickCapture(
+    i2c_driver,
+    qbutton,
+    qrtc,
+    button_poller,
+    record_event,
+    epoch_offset=EPOCH_DIFFERENCE,
+)
+upload_retry = retry.RetryPolicy()
+scheduler = tasks.Scheduler()
+scheduler.spawn(rtc_bootstrap(), "rtc bootstrap")
+scheduler.spawn(button_sampler(), "button")
+scheduler.spawn(network_bootstrap(), "network bootstrap")
+scheduler.spawn(uploader(), "uploader")
+scheduler.spawn(heartbeat(), "heartbeat")
+scheduler.run()
@@ -0,0 +1,145 @@
+"""Run the button capture path against the simulated I2C bus.
+
+Runs on a host (CPython), not on the device:
+
+    $ python3 device/tools/bench_button.py
+
+Clicks a simulated Qwiic Button at a steady rate and runs main.py's capture
+pass (capture.ClickCapture) on simulated time, sleeping the poller's interval
+between passes like the button task does. For each rate prints how many
+clicks were recorded, lost to a full queue or still queued at the end, how
+many timestamps are off by more than a second, how many polls found the queue
+full, and the I2C transactions and host time spent per recorded click.
+"""
+
+import calendar
+import contextlib
+import io
+import os
+import sys
+import time
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "lib"))
+
+import capture  # noqa: E402
+import poller  # noqa: E402
+import qwiic_button  # noqa: E402
+import qwiic_rtc  # noqa: E402
+import simi2c  # noqa: E402
+
+# Simulated time for the runs. simulate() installs it as time.ticks_*.
+clock = simi2c.SimClock()
+
+# Seconds of simulated clicking per rate.
+DURATION_S = 60
+START = (2024, 5, 11, 6, 19, 0)
+# Roughly a byte-register transaction at 100 kHz.
+TRANSACTION_US = 300
+
+
+def simulate(clicks_per_s, duration_s=DURATION_S, millis_offset=0, phase_ms=0):
+    """Click at clicks_per_s for duration_s of simulated time.
+
+    millis_offset starts the button's millis() counter there, e.g. just
+    before its 32-bit rollover. phase_ms delays every click. The RTC only
+    counts hundredths, so a click less than 10 ms into a second can be
+    stamped a second early: at rates that divide a second, a phase keeps the
+    clicks clear of that. Returns a dict of results, see main().
+    """
+    restore_ticks = simi2c.install_ticks(clock)
+    try:
+        return _simulate(clicks_per_s, duration_s, millis_offset, phase_ms)
+    finally:
+        restore_ticks()
+
+
+def _simulate(clicks_per_s, duration_s, millis_offset, phase_ms):
+    # The RTC driver converts with time.mktime(), which is local time here.
+    os.environ["TZ"] = "UTC"
+    time.tzset()
+    epoch = calendar.timegm(START + (0, 0, 0))
+    clock.us = 0
+    button = simi2c.SimQwiicButton(clock, millis_offset=millis_offset)
+    rtc = simi2c.SimRV8803(clock, epoch=epoch)
+    bus = simi2c.SimI2C([button, rtc], clock=clock, transaction_us=TRANSACTION_US)
+    qbutton = qwiic_button.QwiicButton(address=None, i2c_driver=bus)
+    qrtc = qwiic_rtc.QwiicRTC(address=0x32, i2c_driver=bus)
+    if not qbutton.begin():
+        raise OSError("simulated button did not start")
+    button_poller = poller.AdaptivePoller(qbutton)
+    recorded = []
+    click_capture = capture.ClickCapture(
+        bus, qbutton, qrtc, button_poller, recorded.append
+    )
+    bus.transactions = 0
+
+    period_ms = 1000.0 / clicks_per_s
+    expected = []
+    next_click = period_ms + phase_ms
+    next_poll = 0
+    polls = 0
+    host_s = 0.0
+    # What the poller prints, i.e. its queue full warnings.
+    log = io.StringIO()
+    end_ms = duration_s * 1000
+    while clock() < end_ms:
+        if next_click <= next_poll:
+            clock.us = max(clock.us, int(next_click * 1000))
+            before = len(button.clicked)
+            button.click()
+            if len(button.clicked) > before:
+                expected.append(epoch + clock() // 1000)
+            next_click += period_ms
+            continue
+        clock.us = max(clock.us, next_poll * 1000)
+        start = timeit.default_timer()
+        with contextlib.redirect_stdout(log):
+            click_capture.sample()
+        host_s += timeit.default_timer() - start
+        polls += 1
+        next_poll = clock() + button_poller.interval_ms
+
+    # Clicks lost to a full queue never make it into expected, and clicks
+    # still queued come last, so recorded lines up with the start of it.
+    clicks = max(len(recorded), 1)
+    return {
+        "clicked": len(expected) + button.clicked_dropped,
+        "expected": expected,
+        "recorded": recorded,
+        "lost": button.clicked_dropped,
+        "pending": len(button.clicked),
+        "off": sum(1 for want, got in zip(expected, recorded) if abs(want - got) > 1),
+        "full_polls": button_poller.full_polls,
+        "polls": polls,
+        "transactions": bus.transactions,
+        "i2c_per_click": bus.transactions / float(clicks),
+        "us_per_click": host_s * 1e6 / clicks,
+    }
+
+
+def main():
+    print(
+        "click/s  clicked  recorded  lost  pending   off  full polls"
+        "  i2c / click  us / click"
+    )
+    for clicks_per_s in (0.5, 2, 10, 50, 150, 400):
+        r = simulate(clicks_per_s)
+        print(
+            "%7s  %7s  %8s  %4s  %7s  %4s  %10s  %11.1f  %9.1f"
+            % (
+                clicks_per_s,
+                r["clicked"],
+                len(r["recorded"]),
+                r["lost"],
+                r["pending"],
+                r["off"],
+                r["full_polls"],
+                r["i2c_per_click"],
+                r["us_per_click"],
+            )
+        )
+
+
+if __name__ == "__main__":
+    main()
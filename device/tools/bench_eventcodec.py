@@ -0,0 +1,60 @@
+"""Compare the binary event encoding with the JSON upload body.
+
+Runs on a host (CPython), not on the device:
+
+    $ python3 device/tools/bench_eventcodec.py
+"""
+
+import json
+import os
+import random
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "lib"))
+
+import eventcodec  # noqa: E402
+
+PASSWORD = "asdfasdf123"
+REPEATS = 200
+
+
+def json_body(timestamps):
+    return json.dumps(
+        {
+            "password": PASSWORD,
+            "events": [{"pressTimestamp": t} for t in timestamps],
+        }
+    )
+
+
+def main():
+    random.seed(0)
+    print("events  json bytes  binary bytes  json us  binary us")
+    for count in (1, 5, 15, 50, 200):
+        # A few presses a minute, with the odd multi-hour gap.
+        timestamps = [1715408340]
+        for _ in range(count - 1):
+            gap = random.choice((1, 2, 5, 30, 60, 3600 * 6))
+            timestamps.append(timestamps[-1] + gap)
+        buf = bytearray(eventcodec.max_encoded_size(count))
+        length = eventcodec.encode_into(buf, timestamps, count)
+        assert eventcodec.decode(buf[:length]) == timestamps
+        json_us = timeit.timeit(lambda: json_body(timestamps), number=REPEATS)
+        binary_us = timeit.timeit(
+            lambda: eventcodec.encode_into(buf, timestamps, count), number=REPEATS
+        )
+        print(
+            "%6d  %10d  %12d  %7.1f  %9.1f"
+            % (
+                count,
+                len(json_body(timestamps)),
+                length,
+                json_us / REPEATS * 1e6,
+                binary_us / REPEATS * 1e6,
+            )
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+"""Check that the button polling path doesn't allocate.
+
+Runs on the device (needs gc.mem_alloc and the I2C bus), not on a host.
+Copy it to /flash and run it from the REPL instead of main.py:
+
+    >>> import heap_check
+
+Prints the bytes allocated by a run of calls of each polling read, then
+raises AssertionError naming any read that allocated. The RTC read builds
+the tuple time.mktime needs, so it is only reported.
+"""
+
+import gc
+
+import micropython_i2c
+import poller
+import qwiic_button
+import qwiic_rtc
+
+CALLS = 200
+
+
+def _allocated(read):
+    # Bytes allocated by CALLS calls of read, with the collector off.
+    gc.collect()
+    gc.disable()
+    try:
+        before = gc.mem_alloc()
+        for _ in range(CALLS):
+            read()
+        return gc.mem_alloc() - before
+    finally:
+        gc.enable()
+
+
+def _nothing():
+    pass
+
+
+def measure(label, read):
+    """Print and return the bytes CALLS calls of read allocate."""
+    # The first call may allocate once, e.g. a bound method cache.
+    read()
+    # Subtract what the loop itself costs.
+    allocated = _allocated(read) - _allocated(_nothing)
+    print("%s: %s bytes in %s calls" % (label, allocated, CALLS))
+    return allocated
+
+
+i2c_driver = micropython_i2c.MicroPythonI2C()
+qbutton = qwiic_button.QwiicButton(address=None, i2c_driver=i2c_driver)
+qrtc = qwiic_rtc.QwiicRTC(address=0x32, i2c_driver=i2c_driver)
+button_poller = poller.AdaptivePoller(qbutton)
+
+# The reads every poll makes, which must not allocate.
+polling_reads = (
+    ("is_clicked_queue_empty", qbutton.is_clicked_queue_empty),
+    ("read_clicked_queue_status", qbutton.read_clicked_queue_status),
+    ("time_since_first_click", qbutton.time_since_first_click),
+    ("AdaptivePoller.poll", button_poller.poll),
+)
+allocating = [label for label, read in polling_reads if measure(label, read) > 0]
+measure("get_precise_epoch_time", qrtc.get_precise_epoch_time)
+assert not allocating, "allocated while polling: " + ", ".join(allocating)
+print("heap check: ok")
@@ -0,0 +1,258 @@
+"""Check arequests against a local stand-in server with artificial latency.
+
+Runs on a host (CPython), not on the device:
+
+    $ python3 device/tools/test_arequests.py
+
+A threaded HTTP/1.1 server on localhost echoes request bodies, sleeping
+before it answers paths under /slow. Requests run as tasks of the real
+tasks.Scheduler next to a ticker task, which must keep ticking while they
+wait. The device's usocket is stood in for by a thin wrapper of CPython's
+socket module, registered before urequests is imported, and its ticks by
+simi2c's on the wall clock while the tests run.
+"""
+
+import http.server
+import os
+import socket
+import sys
+import threading
+import time
+import types
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "lib"))
+
+# Server latency for /slow, in seconds.
+LATENCY_S = 0.5
+# Longest the ticker may go without running while requests wait.
+MAX_TICK_GAP_MS = 150
+
+
+class _Socket(object):
+    # The subset of the Xbee's usocket.socket that urequests uses.
+    connects = 0
+
+    def __init__(self, af=socket.AF_INET, type=socket.SOCK_STREAM, proto=0):
+        self._s = socket.socket(af, type)
+        self._f = self._s.makefile("rb")
+
+    def connect(self, addr):
+        _Socket.connects += 1
+        try:
+            self._s.connect(addr)
+        except BlockingIOError as e:
+            # In progress on a non-blocking socket, like MicroPython.
+            raise OSError(e.errno, "in progress")
+
+    def write(self, data):
+        if isinstance(data, str):
+            data = data.encode()
+        self._s.sendall(data)
+        return len(data)
+
+    def readline(self):
+        return self._f.readline()
+
+    def read(self, n=-1):
+        return self._f.read(n) if n != -1 else self._f.read()
+
+    def readinto(self, buf, n=None):
+        return self._f.readinto(memoryview(buf)[:n] if n else buf)
+
+    def settimeout(self, t):
+        self._s.settimeout(t)
+
+    def setblocking(self, flag):
+        self._s.setblocking(flag)
+
+    def fileno(self):
+        return self._s.fileno()
+
+    def close(self):
+        self._f.close()
+        self._s.close()
+
+
+def _install_usocket():
+    usocket = types.ModuleType("usocket")
+    usocket.AF_INET = socket.AF_INET
+    usocket.SOCK_STREAM = socket.SOCK_STREAM
+    usocket.IPPROTO_TCP = socket.IPPROTO_TCP
+    # Only the Xbee has TLS sockets, the tests use plain http.
+    usocket.IPPROTO_SEC = -1
+    usocket.getaddrinfo = socket.getaddrinfo
+    usocket.socket = _Socket
+    sys.modules["usocket"] = usocket
+
+
+_install_usocket()
+
+import arequests  # noqa: E402
+import simi2c  # noqa: E402
+import tasks  # noqa: E402
+import urequests  # noqa: E402
+
+
+class _Handler(http.server.BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args):
+        pass
+
+    def _body(self):
+        if self.headers.get("Transfer-Encoding") == "chunked":
+            body = b""
+            while True:
+                size = int(self.rfile.readline(), 16)
+                body += self.rfile.read(size)
+                self.rfile.readline()
+                if not size:
+                    return body
+        return self.rfile.read(int(self.headers.get("Content-Length", 0)))
+
+    def do_POST(self):
+        out = b"echo:" + self._body()
+        if self.path.startswith("/slow"):
+            time.sleep(LATENCY_S)
+        self.send_response(200)
+        if self.path.endswith("/chunked"):
+            self.send_header("Transfer-Encoding", "chunked")
+            self.end_headers()
+            half = len(out) // 2
+            for part in (out[:half], out[half:], b""):
+                self.wfile.write(b"%x\r\n%s\r\n" % (len(part), part))
+            return
+        self.send_header("Content-Length", str(len(out)))
+        self.end_headers()
+        self.wfile.write(out)
+        if self.path.endswith("/drop"):
+            # Keep-alive as far as the client knows, but hang up.
+            self.close_connection = True
+
+
+class _Server(http.server.ThreadingHTTPServer):
+    def handle_error(self, request, client_address):
+        # Clients that gave up (the timeout test) hang up mid-answer.
+        if not isinstance(sys.exc_info()[1], ConnectionError):
+            http.server.ThreadingHTTPServer.handle_error(
+                self, request, client_address
+            )
+
+
+class ARequestsTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        # MicroPython's time.ticks_*, on the wall clock.
+        cls.restore_ticks = simi2c.install_ticks(simi2c.WallClock())
+        cls.server = _Server(("127.0.0.1", 0), _Handler)
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+        cls.base = "http://127.0.0.1:%d" % cls.server.server_address[1]
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+        cls.restore_ticks()
+
+    def setUp(self):
+        self.session = urequests.Session(timeout=5)
+        urequests.stats.reset()
+
+    def tearDown(self):
+        self.session.close()
+
+    def run_task(self, task):
+        """Run task next to a ticker, return what it returned.
+
+        Fails if the ticker was held up for more than MAX_TICK_GAP_MS.
+        """
+        ticks = []
+        result = []
+
+        def ticker():
+            while True:
+                ticks.append(time.ticks_ms())
+                yield 10
+
+        def wrapper():
+            try:
+                result.append((yield from task))
+            except Exception as e:
+                result.append(e)
+
+        scheduler = tasks.Scheduler()
+        scheduler.spawn(wrapper(), "request")
+        scheduler.spawn(ticker(), "ticker")
+        while not result:
+            time.sleep_ms(scheduler.run_once())
+        gaps = [time.ticks_diff(b, a) for a, b in zip(ticks, ticks[1:])]
+        self.assertLess(max(gaps or [0]), MAX_TICK_GAP_MS)
+        if isinstance(result[0], Exception):
+            raise result[0]
+        return result[0]
+
+    def post(self, path, **kw):
+        return arequests.post(self.session, self.base + path, **kw)
+
+    def test_ticker_runs_while_waiting(self):
+        start = time.ticks_ms()
+        response = self.run_task(self.post("/slow", data="one"))
+        self.assertEqual(response.text, "echo:one")
+        self.assertGreaterEqual(time.ticks_diff(time.ticks_ms(), start), 500)
+
+    def test_pipeline_uses_one_connection(self):
+        connects = _Socket.connects
+        requests = [
+            ("POST", self.base + "/slow", "p1", {}),
+            ("POST", self.base + "/slow", "p2", {}),
+            ("POST", self.base + "/x", "p3", {}),
+        ]
+        texts = self.run_task(
+            arequests.pipeline(self.session, requests, lambda r: r.text)
+        )
+        self.assertEqual(texts, ["echo:p1", "echo:p2", "echo:p3"])
+        self.assertEqual(_Socket.connects - connects, 1)
+        # The connection went back to the pool for the next request.
+        self.assertEqual(self.run_task(self.post("/x", data="p4")).text, "echo:p4")
+        self.assertEqual(_Socket.connects - connects, 1)
+        self.assertEqual(urequests.stats.reused_requests, 1)
+
+    def test_stale_pooled_connection_is_retried(self):
+        self.run_task(self.post("/x/drop", data="first")).close()
+        # Pooled, the server hung up without saying so.
+        self.assertTrue(self.session._pool)
+        connects = _Socket.connects
+        response = self.run_task(self.post("/x", data="second"))
+        self.assertEqual(response.text, "echo:second")
+        self.assertEqual(_Socket.connects - connects, 1)
+
+    def test_read_timeout(self):
+        start = time.ticks_ms()
+        with self.assertRaises(urequests.RequestTimeout):
+            self.run_task(
+                self.post("/slow", data="t", timeout=urequests.Timeouts(read=0.2))
+            )
+        self.assertLess(time.ticks_diff(time.ticks_ms(), start), 450)
+
+    def test_connection_refused(self):
+        # A port nothing listens on.
+        probe = socket.socket()
+        probe.bind(("127.0.0.1", 0))
+        port = probe.getsockname()[1]
+        probe.close()
+        with self.assertRaises(OSError) as raised:
+            self.run_task(
+                arequests.post(self.session, "http://127.0.0.1:%d/x" % port, data="t")
+            )
+        self.assertNotIsInstance(raised.exception, urequests.RequestTimeout)
+
+    def test_chunked_request_and_response(self):
+        response = self.run_task(
+            self.post("/slow/chunked", data=lambda: iter(["ab", b"cd", "e"]))
+        )
+        self.assertEqual(response.text, "echo:abcde")
+
+
+if __name__ == "__main__":
+    unittest.main()
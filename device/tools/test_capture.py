@@ -0,0 +1,151 @@
+"""Check the button capture path against the simulated I2C bus.
+
+Runs on a host (CPython), not on the device:
+
+    $ python3 device/tools/test_capture.py
+
+Drives capture.ClickCapture, the pass main.py's button task runs, through
+bench_button.simulate() on simulated time.
+"""
+
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(__file__))
+
+import bench_button  # noqa: E402
+
+import capture  # noqa: E402
+import poller  # noqa: E402
+import qwiic_button  # noqa: E402
+import qwiic_rtc  # noqa: E402
+import simi2c  # noqa: E402
+
+# Keeps steady clicks clear of whole seconds, see bench_button.simulate().
+PHASE_MS = 37
+
+
+class _FlakyI2C(simi2c.SimI2C):
+    # Fails transaction number fail_at, counted from when it was set.
+    fail_at = None
+
+    def _device(self, address):
+        if self.fail_at is not None:
+            self.fail_at -= 1
+            if not self.fail_at:
+                self.fail_at = None
+                raise OSError(5, "bus error")
+        return simi2c.SimI2C._device(self, address)
+
+
+class CaptureTest(unittest.TestCase):
+    def setUp(self):
+        # simulate() installs its own, clicked_rig() runs on this one.
+        self.restore_ticks = simi2c.install_ticks(bench_button.clock)
+
+    def tearDown(self):
+        self.restore_ticks()
+
+    def assert_all_recorded(self, result):
+        self.assertEqual(result["lost"], 0)
+        self.assertEqual(result["full_polls"], 0)
+        recorded = result["recorded"]
+        self.assertEqual(len(recorded) + result["pending"], len(result["expected"]))
+        self.assertEqual(recorded, result["expected"][: len(recorded)])
+
+    def test_normal_rates(self):
+        for clicks_per_s in (0.5, 2, 10):
+            result = bench_button.simulate(clicks_per_s, phase_ms=PHASE_MS)
+            self.assert_all_recorded(result)
+
+    def test_millis_rollover(self):
+        # The button's 32-bit millis() wraps 20 s into the run.
+        result = bench_button.simulate(
+            2, millis_offset=0xFFFFFFFF - 20000, phase_ms=PHASE_MS
+        )
+        self.assert_all_recorded(result)
+
+    def test_overload_is_counted(self):
+        result = bench_button.simulate(400, duration_s=10)
+        self.assertGreater(result["lost"], 0)
+        self.assertGreater(result["full_polls"], 0)
+        # What does get through is still stamped right.
+        self.assertEqual(result["off"], 0)
+
+    def test_idle_polls_are_one_read(self):
+        # The first click would come after the run.
+        result = bench_button.simulate(0.01, duration_s=60)
+        self.assertEqual(result["recorded"], [])
+        self.assertEqual(result["transactions"], result["polls"])
+
+    def clicked_rig(self, clicks):
+        """Return (bus, button, capture, recorded) with clicks queued."""
+        clock = bench_button.clock
+        clock.us = 0
+        button = simi2c.SimQwiicButton(clock)
+        bus = _FlakyI2C([button, simi2c.SimRV8803(clock)])
+        qbutton = qwiic_button.QwiicButton(address=None, i2c_driver=bus)
+        qrtc = qwiic_rtc.QwiicRTC(address=0x32, i2c_driver=bus)
+        recorded = []
+        click_capture = capture.ClickCapture(
+            bus, qbutton, qrtc, poller.AdaptivePoller(qbutton), recorded.append
+        )
+        for _ in range(clicks):
+            clock.advance(700)
+            button.click()
+        return bus, button, click_capture, recorded
+
+    def test_bus_error_leaves_clicks_on_the_button(self):
+        bus, button, click_capture, recorded = self.clicked_rig(3)
+        bus.detach(button)
+        with self.assertRaises(OSError):
+            click_capture.sample()
+        bus.attach(button)
+        self.assertEqual(click_capture.sample(), 3)
+        self.assertEqual(len(recorded), 3)
+        self.assertEqual(button.clicked, [])
+
+    def test_bus_error_mid_drain_keeps_popped_clicks(self):
+        _, _, click_capture, want = self.clicked_rig(5)
+        transactions = click_capture.i2c_driver.transactions
+        click_capture.sample()
+        transactions = click_capture.i2c_driver.transactions - transactions
+        self.assertEqual(len(want), 5)
+        # Fail each transaction of the pass in turn, then retry it.
+        for fail_at in range(1, transactions + 1):
+            bus, button, click_capture, recorded = self.clicked_rig(5)
+            bus.fail_at = fail_at
+            with self.assertRaises(OSError):
+                click_capture.sample()
+            # Every click is either recorded or still on the button.
+            self.assertEqual(len(recorded) + len(button.clicked), 5, fail_at)
+            click_capture.sample()
+            self.assertEqual(recorded, want, fail_at)
+            self.assertEqual(button.clicked, [])
+
+    def test_fast_double_click_is_forgotten(self):
+        _, button, click_capture, _ = self.clicked_rig(0)
+        clock = bench_button.clock
+        button_poller = click_capture.poller
+        button.click()
+        clock.advance(40)
+        button.click()
+        next_click = clock() + 60 * 1000
+        end_ms = clock() + 2 * 60 * 60 * 1000
+        ceilings = []
+        while clock() < end_ms:
+            if clock() >= next_click:
+                # Single clicks alone never show a rate.
+                button.click()
+                next_click += 60 * 1000
+            click_capture.sample()
+            ceilings.append(button_poller.ceiling_ms)
+            clock.advance(button_poller.interval_ms)
+        self.assertLess(min(ceilings), button_poller.slow_ms)
+        self.assertEqual(button_poller.ceiling_ms, button_poller.slow_ms)
+        self.assertEqual(button_poller.interval_ms, button_poller.slow_ms)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,139 @@
+"""Check the event journal's recovery from torn writes.
+
+Runs on a host (CPython), not on the device:
+
+    $ python3 device/tools/test_journal.py
+
+The device's uos is stood in for by CPython's os, and /flash by a temporary
+directory. Power loss is simulated by leaving the files as a write or a
+compaction would have left them part way through.
+"""
+
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "lib"))
+
+# stat, remove and rename are all the journal uses.
+sys.modules.setdefault("uos", os)
+
+import journal  # noqa: E402
+
+
+class JournalTest(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.dir, "events")
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def open(self):
+        return journal.Journal(self.path)
+
+    def tear(self, suffix, data=b"\x07"):
+        # What a write cut short by a power loss leaves behind.
+        with open(self.path + suffix, "ab") as f:
+            f.write(data)
+
+    def filled(self, count, acked=0):
+        j = self.open()
+        for timestamp in range(count):
+            j.append(timestamp)
+        j.flush()
+        j.ack(acked)
+        return j
+
+    def test_reopen(self):
+        self.filled(10, acked=4)
+        self.assertEqual(list(self.open().replay()), list(range(4, 10)))
+
+    def test_torn_log_record(self):
+        self.filled(3)
+        self.tear(".log")
+        j = self.open()
+        self.assertEqual(len(j), 3)
+        j.append(3)
+        j.flush()
+        self.assertEqual(list(self.open().replay()), [0, 1, 2, 3])
+
+    def test_torn_ack_record(self):
+        self.filled(10, acked=5)
+        self.tear(".ack")
+        j = self.open()
+        self.assertEqual(len(j), 5)
+        j.ack(1)
+        j = self.open()
+        self.assertEqual(len(j), 4)
+        self.assertEqual(list(j.replay()), [6, 7, 8, 9])
+
+    def check_starts_empty(self):
+        j = self.open()
+        self.assertEqual(len(j), 0)
+        j.append(1)
+        j.flush()
+        self.assertEqual(list(self.open().replay()), [1])
+
+    def test_empty_log(self):
+        self.tear(".log", b"")
+        self.check_starts_empty()
+
+    def test_torn_log_header(self):
+        self.tear(".log", b"\x00\x00")
+        self.check_starts_empty()
+
+    def test_new_log_starts_past_stale_acks(self):
+        self.filled(10, acked=10)
+        os.remove(self.path + ".log")
+        j = self.open()
+        j.append(42)
+        j.flush()
+        self.assertEqual(list(self.open().replay()), [42])
+
+    def test_compaction_interrupted_while_writing(self):
+        self.filled(10, acked=4)
+        self.tear(".new", b"\x04\x00")
+        self.assertEqual(list(self.open().replay()), list(range(4, 10)))
+
+    def test_compaction_interrupted_before_swap(self):
+        j = self.filled(10, acked=4)
+        rename = os.rename
+
+        def fail(*args):
+            raise OSError(5, "power lost")
+
+        os.rename = fail
+        try:
+            with self.assertRaises(OSError):
+                j.compact()
+        finally:
+            os.rename = rename
+        self.assertFalse(os.path.exists(self.path + ".log"))
+        self.assertEqual(list(self.open().replay()), list(range(4, 10)))
+
+    def test_compaction_interrupted_before_ack_reset(self):
+        j = self.filled(10, acked=4)
+        with open(self.path + ".ack", "rb") as f:
+            acks = f.read()
+        j.compact()
+        with open(self.path + ".ack", "wb") as f:
+            f.write(acks)
+        self.assertEqual(list(self.open().replay()), list(range(4, 10)))
+
+    def test_no_compaction_below_thresholds(self):
+        # Each upload acks everything, that alone mustn't rewrite the log.
+        j = journal.Journal(self.path, compact_after=8)
+        for timestamp in range(7):
+            j.append(timestamp)
+            j.ack(1)
+            self.assertFalse(j.needs_compaction())
+        j.append(7)
+        j.ack(1)
+        self.assertTrue(j.needs_compaction())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -100,9 +100,14 @@ async function deviceExistsMiddleware(c: Context, next: () => Promise<void>) {
 	await next();
 }
 
+function isBinaryUpload(c: Context): boolean {
+	return c.req.header('Content-Type') === 'application/octet-stream';
+}
+
 async function checkAuth(c: Context, next: () => Promise<void>) {
 	const device = c.req.param('device');
-	const postedData = await c.req.json().catch(() => ({}));
+	// Binary uploads carry the password in a header instead of the body.
+	const postedData = isBinaryUpload(c) ? { password: c.req.header('X-Password') } : await c.req.json().catch(() => ({}));
 	if (!postedData.password) {
 		return c.text('error', 400);
 	}
@@ -117,6 +122,48 @@ async function checkAuth(c: Context, next: () => Promise<void>) {
 	await next();
 }
 
+function decodeBinaryEvents(body: ArrayBuffer): EventData[] {
+	/* Decode the device's compact event encoding (see device/lib/eventcodec.py):
+	 * version byte, varint count, uint32 LE first timestamp, zigzag varint deltas.
+	 */
+	const bytes = new Uint8Array(body);
+	let pos = 0;
+	const readVarint = (): number => {
+		let value = 0;
+		let scale = 1;
+		while (true) {
+			if (pos >= bytes.length) {
+				throw new Error('truncated event data');
+			}
+			const b = bytes[pos++];
+			value += (b & 0x7f) * scale;
+			if (!(b & 0x80)) {
+				return value;
+			}
+			scale *= 128;
+		}
+	};
+	if (bytes[pos++] !== 1) {
+		throw new Error('unsupported event encoding');
+	}
+	const count = readVarint();
+	if (count == 0) {
+		return [];
+	}
+	if (pos + 4 > bytes.length) {
+		throw new Error('truncated event data');
+	}
+	let timestamp = (bytes[pos] | (bytes[pos + 1] << 8) | (bytes[pos + 2] << 16) | (bytes[pos + 3] << 24)) >>> 0;
+	pos += 4;
+	const events: EventData[] = [{ pressTimestamp: timestamp }];
+	for (let i = 1; i < count; i++) {
+		const zigzag = readVarint();
+		timestamp += zigzag % 2 ? -(zigzag + 1) / 2 : zigzag / 2;
+		events.push({ pressTimestamp: timestamp });
+	}
+	return events;
+}
+
 function formatDeviceDataToRelativeTimes(deviceData: DeviceData, timezone): string[] {
 	const reversedData = deviceData.events.slice().reverse();
 	return reversedData.map((entry) => {
@@ -213,8 +260,22 @@ app.post('/:device/data', async (c) => {
 	 */
 	const device = c.req.param('device');
 	// Register the incoming data.
-	const postedData = await c.req.json();
-	if (!postedData.pressTimestamp) {
+	// Devices may post a single event, a batch of them under `events`,
+	// or a batch in the compact binary encoding.
+	let postedEvents: EventData[] = [];
+	if (isBinaryUpload(c)) {
+		try {
+			postedEvents = decodeBinaryEvents(await c.req.arrayBuffer());
+		} catch (e) {
+			return c.text('error', 400);
+		}
+	} else {
+		const postedData = await c.req.json();
+		postedEvents = Array.isArray(postedData.events)
+			? postedData.events.map((event: EventData) => ({ pressTimestamp: event.pressTimestamp }))
+			: [{ pressTimestamp: postedData.pressTimestamp }];
+	}
+	if (postedEvents.length == 0 || postedEvents.some((event) => !event.pressTimestamp)) {
 		return c.text('error', 400);
 	}
 	// First get the existing data in the db.
@@ -223,17 +284,13 @@ app.post('/:device/data', async (c) => {
 	if (existingData == null) {
 		// Populate for the first time.
 		updatedData = {
-			events: [
-				{
-					pressTimestamp: postedData.pressTimestamp,
-				},
-			],
+			events: postedEvents,
 		};
 	} else {
 		// Append.
 		let jsonData: DeviceData = JSON.parse(existingData);
 		updatedData = {
-			events: [...jsonData.events, { pressTimestamp: postedData.pressTimestamp }],
+			events: [...jsonData.events, ...postedEvents],
 		};
 	}
 	await c.env.DB.put(`data:${device}`, JSON.stringify(updatedData));